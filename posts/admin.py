@@ -1,14 +1,42 @@
 from django.contrib import admin
 
+from . import search
 from .models import Comment, Follow, Group, Post, User
+from .pagination import CountCachedPaginator
 
 
-class PostAdmin(admin.ModelAdmin):
+class CountCachedAdmin(admin.ModelAdmin):
+    """Список без COUNT(*) на каждый показ, см. CountCachedPaginator.
+    Счётчик сбрасывается вместе с версиями count_scopes; без них живёт
+    pagination.COUNT_CACHE_TIMEOUT."""
+    count_scopes = ()
+    # Иначе ChangeList считает ещё и все строки без фильтров
+    show_full_result_count = False
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        return CountCachedPaginator(queryset, per_page, orphans,
+                                    allow_empty_first_page,
+                                    scopes=self.count_scopes)
+
+
+class PostAdmin(CountCachedAdmin):
+    # Любой пост сбрасывает общую ленту
+    count_scopes = ("global",)
     list_display = ("text", "pub_date", "author")
     search_fields = ("text",)
     list_filter = ("pub_date",)
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту через индекс FTS5 вместо LIKE '%...%'
+        if not search_term or not search.available():
+            return super().get_search_results(request, queryset, search_term)
+        if not search.match_expression(search_term):
+            return queryset.none(), False
+        return queryset.filter(
+            pk__in=search.matching_ids(search_term)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ("title", "description", "slug")
@@ -17,14 +45,18 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = "-пусто-"
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(CountCachedAdmin):
+    # Комментарий меняет счётчик в карточке поста и сбрасывает ленты
+    count_scopes = ("global",)
     list_display = ("author", "text", "created")
     search_fields = ("text",)
-    list_filter = ("text",)
+    list_filter = ("created",)
     empty_value_display = "-пусто-"
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(CountCachedAdmin):
+    # Любая подписка или отписка
+    count_scopes = ("follows",)
     list_display = ("user", "author", "subscribe_date", "following")
     search_fields = ("author",)
     list_filter = ("author",)
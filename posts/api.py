@@ -0,0 +1,260 @@
+"""JSON API для чтения: ленты, посты, комментарии, группы и подписки.
+
+Строки выбираются через values(), без создания объектов моделей, одним
+запросом с JOIN автора и группы, как и в HTML-лентах. Параметры:
+
+    ?fields=id,text,author  только перечисленные поля;
+    ?ids=3,1,2              несколько объектов по id одним запросом,
+                            в порядке ids;
+    ?cursor=...             страница после курсора из next/previous;
+    ?limit=20               размер страницы, не больше MAX_LIMIT.
+"""
+from functools import partial, wraps
+
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_GET
+
+from yatube.replica import reads_from_replica
+
+from . import conditional
+from .models import Comment, Follow, Group, Post, User
+from .pagination import (MAX_PK, POSTS_PER_PAGE, build_page, read_cursor,
+                         window)
+from .timeline import follow_feed
+
+MAX_LIMIT = 100
+MAX_IDS = 100
+
+# Имя поля в ответе -> путь в ORM
+POST_FIELDS = {
+    "id": "pk",
+    "text": "text",
+    "pub_date": "pub_date",
+    "author": "author__username",
+    "group": "group__slug",
+    "image": "image",
+    "comment_count": "comment_count",
+}
+COMMENT_FIELDS = {
+    "id": "pk",
+    "post": "post_id",
+    "author": "author__username",
+    "text": "text",
+    "created": "created",
+    "parent": "parent_id",
+    "depth": "depth",
+    "reply_count": "reply_count",
+}
+GROUP_FIELDS = {
+    "id": "pk",
+    "slug": "slug",
+    "title": "title",
+    "description": "description",
+}
+FOLLOW_FIELDS = {
+    "id": "pk",
+    "user": "user__username",
+    "author": "author__username",
+    "subscribe_date": "subscribe_date",
+}
+
+
+def image_url(value):
+    # Строка из values() или FieldFile загруженного объекта
+    name = getattr(value, "name", value)
+    return default_storage.url(name) if name else None
+
+
+CONVERTERS = {"image": image_url}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_view(view=None, *, etag_func=None):
+    """GET-only view, отдающий словарь как JSON; ApiError - код ошибки.
+    Только чтение, поэтому с реплики. etag_func - как у condition();
+    ETag считается уже внутри, с реплики и с учётом привязки к основной
+    базе после записи:
+
+        @api_view(etag_func=conditional.index_etag)
+    """
+    if view is None:
+        return partial(api_view, etag_func=etag_func)
+
+    @wraps(view)
+    def respond(request, *args, **kwargs):
+        try:
+            data = view(request, *args, **kwargs)
+        except ApiError as error:
+            data = {"error": str(error)}
+            status = error.status
+        else:
+            status = 200
+        return JsonResponse(data, status=status,
+                            json_dumps_params={"ensure_ascii": False})
+    if etag_func is not None:
+        respond = condition(etag_func=etag_func)(respond)
+    return require_GET(reads_from_replica(respond))
+
+
+def get_or_404(model, message, **lookups):
+    obj = model.objects.filter(**lookups).first()
+    if obj is None:
+        raise ApiError(message, status=404)
+    return obj
+
+
+def requested_fields(request, spec):
+    names = [name for name in request.GET.get("fields", "").split(",")
+             if name]
+    if not names:
+        return list(spec)
+    unknown = sorted(set(names) - set(spec))
+    if unknown:
+        raise ApiError(f"Неизвестные поля: {', '.join(unknown)}")
+    return names
+
+
+def requested_ids(request):
+    if "ids" not in request.GET:
+        return None
+    values = [pk for pk in request.GET["ids"].split(",") if pk]
+    if len(values) > MAX_IDS:
+        raise ApiError(f"Не больше {MAX_IDS} ids за запрос")
+    try:
+        ids = [int(pk) for pk in values]
+    except ValueError:
+        raise ApiError("ids - список целых чисел через запятую")
+    if not all(1 <= pk <= MAX_PK for pk in ids):
+        raise ApiError(f"ids - числа от 1 до {MAX_PK}")
+    return ids
+
+
+def requested_limit(request):
+    try:
+        limit = int(request.GET.get("limit", POSTS_PER_PAGE))
+    except ValueError:
+        raise ApiError("limit - целое число")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def serialize(row, names, spec):
+    """Строка values() -> словарь ответа."""
+    result = {}
+    for name in names:
+        value = row[spec[name]]
+        convert = CONVERTERS.get(name)
+        result[name] = convert(value) if convert else value
+    return result
+
+
+def serialize_object(obj, names, spec):
+    """То же для уже загруженного объекта модели."""
+    row = {}
+    for name in names:
+        value = obj
+        for attr in spec[name].split("__"):
+            value = getattr(value, attr) if value is not None else None
+        row[spec[name]] = value
+    return serialize(row, names, spec)
+
+
+def listing(request, queryset, spec, field):
+    """Страница по курсору или выборка по ?ids= из queryset."""
+    names = requested_fields(request, spec)
+    lookups = {spec[name] for name in names} | {"pk", field}
+    ids = requested_ids(request)
+    if ids is not None:
+        rows = {row["pk"]: row for row in
+                queryset.filter(pk__in=ids).values(*lookups)}
+        return {"results": [serialize(rows[pk], names, spec)
+                            for pk in ids if pk in rows]}
+    limit = requested_limit(request)
+    token, cursor = read_cursor(request)
+    rows = window(queryset.values(*lookups), cursor, limit, field)
+    paginator, page = build_page(rows, token, cursor, limit, field)
+    return {"results": [serialize(row, names, spec) for row in page],
+            "next": page.next_cursor,
+            "previous": page.previous_cursor}
+
+
+@api_view(etag_func=conditional.index_etag)
+def posts(request):
+    return listing(request, Post.objects.all(), POST_FIELDS, "pub_date")
+
+
+@api_view
+def post_detail(request, post_id):
+    names = requested_fields(request, POST_FIELDS)
+    row = Post.objects.filter(pk=post_id).values(
+        *{POST_FIELDS[name] for name in names}).first()
+    if row is None:
+        raise ApiError("Пост не найден", status=404)
+    return serialize(row, names, POST_FIELDS)
+
+
+@api_view
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        raise ApiError("Пост не найден", status=404)
+    return listing(request, Comment.objects.filter(post_id=post_id),
+                   COMMENT_FIELDS, "created")
+
+
+@api_view
+def groups(request):
+    names = requested_fields(request, GROUP_FIELDS)
+    queryset = Group.objects.order_by("title")
+    ids = requested_ids(request)
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    rows = queryset.values(*{GROUP_FIELDS[name] for name in names})
+    return {"results": [serialize(row, names, GROUP_FIELDS)
+                        for row in rows]}
+
+
+@api_view(etag_func=conditional.group_etag)
+def group_posts(request, slug):
+    group = get_or_404(Group, "Группа не найдена", slug=slug)
+    return listing(request, group.posts.all(), POST_FIELDS, "pub_date")
+
+
+@api_view(etag_func=conditional.profile_etag)
+def user_posts(request, username):
+    author = get_or_404(User, "Пользователь не найден", username=username)
+    return listing(request, author.author_posts.all(), POST_FIELDS,
+                   "pub_date")
+
+
+@api_view
+def following(request, username):
+    """Подписки пользователя: на кого он подписан."""
+    user = get_or_404(User, "Пользователь не найден", username=username)
+    return listing(request, Follow.objects.filter(user=user),
+                   FOLLOW_FIELDS, "subscribe_date")
+
+
+@api_view
+def followers(request, username):
+    author = get_or_404(User, "Пользователь не найден", username=username)
+    return listing(request, Follow.objects.filter(author=author),
+                   FOLLOW_FIELDS, "subscribe_date")
+
+
+@api_view
+def follow_index(request):
+    """Лента подписок; посты знаменитостей подмешиваются, как в HTML."""
+    if not request.user.is_authenticated:
+        raise ApiError("Нужна авторизация", status=401)
+    names = requested_fields(request, POST_FIELDS)
+    paginator, page = follow_feed(request, request.user,
+                                  requested_limit(request))
+    return {"results": [serialize_object(post, names, POST_FIELDS)
+                        for post in page],
+            "next": page.next_cursor,
+            "previous": page.previous_cursor}
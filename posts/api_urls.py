@@ -0,0 +1,33 @@
+from django.urls import path
+
+from . import api
+
+urlpatterns = [
+    path("posts/",
+         api.posts,
+         name="api_posts"),
+    path("posts/<int:post_id>/",
+         api.post_detail,
+         name="api_post"),
+    path("posts/<int:post_id>/comments/",
+         api.post_comments,
+         name="api_post_comments"),
+    path("groups/",
+         api.groups,
+         name="api_groups"),
+    path("groups/<slug:slug>/posts/",
+         api.group_posts,
+         name="api_group_posts"),
+    path("users/<str:username>/posts/",
+         api.user_posts,
+         name="api_user_posts"),
+    path("users/<str:username>/following/",
+         api.following,
+         name="api_following"),
+    path("users/<str:username>/followers/",
+         api.followers,
+         name="api_followers"),
+    path("follow/",
+         api.follow_index,
+         name="api_follow_index"),
+]
@@ -1,5 +1,18 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def install_search(sender, using, **kwargs):
+    # Пересоздание таблицы posts_post в миграциях SQLite удаляет триггеры
+    # полнотекстового индекса, поэтому проверяем их после каждого migrate
+    from . import search
+    search.install(connections[using])
 
 
 class PostsConfig(AppConfig):
     name = "posts"
+
+    def ready(self):
+        from . import signals  # noqa
+        post_migrate.connect(install_search, sender=self)
@@ -0,0 +1,110 @@
+"""Бюджеты SQL-запросов для страниц и API.
+
+BUDGETS задаёт для каждого имени URL из posts.urls и posts.api_urls
+максимум запросов и суммарного времени SQL на один холодный (с пустым
+кэшем) запрос авторизованного пользователя. Проверку на наборе данных
+generate_dataset делает tests/test_query_budgets.py; при превышении
+в сообщении перечисляются повторяющиеся запросы - обычно это N+1.
+Для лент из FEEDS там же проверяется, что каждый запрос идёт по индексу
+(EXPLAIN QUERY PLAN).
+"""
+import re
+from collections import Counter, namedtuple
+
+Budget = namedtuple("Budget", "queries time_ms")
+
+BUDGETS = {
+    "index": Budget(8, 100),
+    "new_post": Budget(4, 50),
+    "group": Budget(10, 100),
+    "follow_index": Budget(8, 100),
+    "search": Budget(5, 150),
+    "profile": Budget(10, 100),
+    "post": Budget(10, 100),
+    "post_comments": Budget(7, 100),
+    "comment_replies": Budget(6, 100),
+    "post_edit": Budget(5, 50),
+    "api_posts": Budget(4, 100),
+    "api_post": Budget(2, 50),
+    "api_post_comments": Budget(3, 100),
+    "api_groups": Budget(2, 50),
+    "api_group_posts": Budget(6, 100),
+    "api_user_posts": Budget(6, 100),
+    "api_following": Budget(3, 50),
+    "api_followers": Budget(3, 50),
+    "api_follow_index": Budget(5, 100),
+}
+
+LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\?(?:\s*,\s*\?)+"), "?, ..."),
+]
+
+
+def normalize(sql):
+    """SQL без значений: запросы, отличающиеся только id, совпадают."""
+    for pattern, replacement in LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def duplicates(queries):
+    """[(число, SQL)] для запросов, выполненных больше одного раза."""
+    counts = Counter(normalize(query["sql"]) for query in queries)
+    return [(count, sql) for sql, count in counts.most_common()
+            if count > 1]
+
+
+def sql_time_ms(queries):
+    return sum(float(query["time"]) for query in queries) * 1000
+
+
+def check(name, queries):
+    """Текст ошибки, если запросы страницы name не уложились в бюджет,
+    иначе None. queries - captured_queries из CaptureQueriesContext."""
+    budget = BUDGETS[name]
+    spent = sql_time_ms(queries)
+    problems = []
+    if len(queries) > budget.queries:
+        problems.append(f"запросов {len(queries)} > {budget.queries}")
+    if spent > budget.time_ms:
+        problems.append(f"время SQL {spent:.1f} мс > {budget.time_ms} мс")
+    if not problems:
+        return None
+    lines = [f"{name}: " + ", ".join(problems)]
+    repeated = duplicates(queries)
+    if repeated:
+        lines.append("Повторяющиеся запросы:")
+        lines += [f"  {count}x {sql}" for count, sql in repeated]
+    return "\n".join(lines)
+
+
+# Ленты и списки: их запросы должны идти по индексу в порядке сортировки
+FEEDS = ["index", "group", "profile", "follow_index", "post",
+         "post_comments", "comment_replies", "api_posts",
+         "api_post_comments", "api_group_posts", "api_user_posts",
+         "api_following", "api_followers", "api_follow_index"]
+# Полный проход таблицы (без USING INDEX) или сортировка во временном
+# B-дереве в выводе EXPLAIN QUERY PLAN SQLite
+BAD_PLAN = re.compile(r"^SCAN (TABLE )?\w+$|USE TEMP B-TREE FOR ORDER BY")
+
+
+def query_plan(connection, sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def unindexed(connection, queries):
+    """[(SQL, строки плана)] для SELECT, которые читают таблицу целиком
+    или сортируют без индекса. Только для SQLite."""
+    result = []
+    for query in queries:
+        if not query["sql"].startswith("SELECT"):
+            continue
+        plan = query_plan(connection, query["sql"])
+        bad = [line for line in plan if BAD_PLAN.search(line)]
+        if bad:
+            result.append((query["sql"], bad))
+    return result
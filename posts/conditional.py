@@ -0,0 +1,94 @@
+"""Валидаторы условных GET-запросов (ETag и Last-Modified) для публичных
+страниц. Считаются по счётчикам поколений из posts.versions, без выборки
+постов и рендеринга шаблонов."""
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from .models import Group, Post, User
+from .versions import author_scope, feed_version, group_scope, viewer_versions
+
+
+def _etag(request, *scopes):
+    raw = "|".join((feed_version(request.user, *scopes),
+                    str(request.user.pk),
+                    request.GET.urlencode()))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _last_modified(request, *scopes):
+    """Время последнего сброса лент: счётчики не меньше времени записи
+    в мс и, в отличие от Max(pub_date), меняются при правке и удалении.
+    Last-Modified точен до секунды, поэтому после записи в текущую
+    секунду заголовка нет: следующая запись в ту же секунду дала бы то
+    же значение и 304 со старой страницей."""
+    seconds = max(viewer_versions(request.user, *scopes)) // 1000
+    if seconds >= int(time.time()):
+        return None
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+def _group_id(slug):
+    return Group.objects.filter(slug=slug).values_list(
+        "pk", flat=True).first()
+
+
+def _author_id(username):
+    return User.objects.filter(username=username).values_list(
+        "pk", flat=True).first()
+
+
+def _post_author_id(post_id):
+    return Post.objects.filter(pk=post_id).values_list(
+        "author_id", flat=True).first()
+
+
+def index_etag(request):
+    return _etag(request, "global")
+
+
+def index_last_modified(request):
+    return _last_modified(request, "global")
+
+
+def group_etag(request, slug):
+    group_id = _group_id(slug)
+    if group_id is None:
+        return None
+    return _etag(request, group_scope(group_id))
+
+
+def group_last_modified(request, slug):
+    group_id = _group_id(slug)
+    if group_id is None:
+        return None
+    return _last_modified(request, group_scope(group_id))
+
+
+def profile_etag(request, username):
+    author_id = _author_id(username)
+    if author_id is None:
+        return None
+    return _etag(request, author_scope(author_id))
+
+
+def profile_last_modified(request, username):
+    author_id = _author_id(username)
+    if author_id is None:
+        return None
+    return _last_modified(request, author_scope(author_id))
+
+
+def post_etag(request, username, post_id):
+    author_id = _post_author_id(post_id)
+    if author_id is None:
+        return None
+    return _etag(request, author_scope(author_id))
+
+
+def post_last_modified(request, username, post_id):
+    # Правки поста и его комментарии сбрасывают ленту автора
+    author_id = _post_author_id(post_id)
+    if author_id is None:
+        return None
+    return _last_modified(request, author_scope(author_id))
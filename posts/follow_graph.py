@@ -0,0 +1,55 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow
+
+
+class FollowGraph:
+    """Граф подписок поверх модели Follow.
+
+    Множества подписок и подписчиков каждого пользователя хранятся в кэше,
+    поэтому проверка подписки - поиск в множестве, а для целой страницы
+    ленты нужен не больше чем один запрос. Кэш сбрасывается сигналами
+    при создании и удалении Follow (см. posts.signals).
+    """
+    timeout = 60 * 60
+
+    def _get(self, kind, user_id, field, filter_field):
+        key = f"follow_graph:{kind}:{user_id}"
+        ids = cache.get(key)
+        if ids is None:
+            ids = frozenset(Follow.objects.filter(
+                **{filter_field: user_id}
+            ).order_by().values_list(field, flat=True))
+            cache.set(key, ids, self.timeout)
+        return ids
+
+    def following(self, user_id):
+        """id авторов, на которых подписан пользователь."""
+        if user_id is None:
+            return frozenset()
+        return self._get("following", user_id, "author_id", "user_id")
+
+    def followers(self, user_id):
+        """id подписчиков автора."""
+        if user_id is None:
+            return frozenset()
+        return self._get("followers", user_id, "user_id", "author_id")
+
+    def is_following(self, user, author):
+        return author.pk in self.following(user.pk)
+
+    def is_following_many(self, user, authors):
+        """{id автора: подписан ли user} для набора авторов."""
+        following = self.following(user.pk)
+        return {author.pk: author.pk in following for author in authors}
+
+    def invalidate(self, user_id, author_id):
+        """Сброс после фиксации транзакции: иначе параллельный запрос
+        успел бы снова закэшировать множества без новой строки Follow."""
+        keys = [f"follow_graph:following:{user_id}",
+                f"follow_graph:followers:{author_id}"]
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+follow_graph = FollowGraph()
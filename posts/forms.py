@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Comment, Post
 
 
@@ -15,6 +17,13 @@ class PostForm(forms.ModelForm):
         help_texts = {'text': 'Текст поста, если что...',
                       'group': 'Тут можно ничего не выбирать, если не хочется.'}
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Новая загрузка; уже сохранённую картинку не трогаем
+        if isinstance(image, UploadedFile):
+            return images.ingest(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
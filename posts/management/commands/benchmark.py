@@ -0,0 +1,199 @@
+import json
+import platform
+import statistics
+import tempfile
+import time
+
+import django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import (CaptureQueriesContext,
+                               setup_test_environment,
+                               teardown_test_environment)
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from posts import api_urls, urls
+from posts.models import Comment, Group, Post, User
+
+# Объёмы данных: параметры generate_dataset
+TIERS = {
+    "small": {"users": 100, "posts": 1000, "comments": 3000},
+    "medium": {"users": 1000, "posts": 20000, "comments": 60000},
+    "large": {"users": 10000, "posts": 200000, "comments": 600000},
+}
+# Меняют данные или не открываются GET-запросом
+SKIP = {"profile_follow", "profile_unfollow", "add_comment", "404", "500"}
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(share / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+class RowCounter:
+    """Считает строки, которые база вернула в Python: подменяет методы
+    fetch* у курсора каждого выполненного запроса."""
+
+    def __init__(self):
+        self.rows = 0
+
+    def count(self, fetch):
+        def counted(*args):
+            result = fetch(*args)
+            if isinstance(result, (list, tuple)):
+                # fetchone() возвращает одну строку-кортеж
+                self.rows += 1 if fetch.__name__ == "fetchone" else len(
+                    result)
+            return result
+        return counted
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        cursor = context["cursor"]
+        for name in ("fetchone", "fetchmany", "fetchall"):
+            setattr(cursor, name, self.count(getattr(cursor.cursor, name)))
+        return result
+
+
+def sample_arguments():
+    """Значения параметров URL из данных: самые нагруженные объекты."""
+    author = (User.objects.order_by("-stats__followers_count")
+              .values_list("username", flat=True).first())
+    post = (Post.objects.order_by("-comment_count")
+            .values_list("pk", "author__username").first())
+    comment = (Comment.objects.order_by("-reply_count")
+               .values_list("pk", "post_id", "post__author__username")
+               .first())
+    group = Group.objects.values_list("slug", flat=True).first()
+    if not (author and post and group):
+        raise CommandError("В базе нет данных; запустите generate_dataset")
+    arguments = {"username": author, "post_id": post[0], "slug": group}
+    per_view = {"post_edit": {"username": post[1]},
+                "post": {"username": post[1]},
+                "post_comments": {"username": post[1]}}
+    if comment:
+        per_view["comment_replies"] = {"comment_id": comment[0],
+                                       "post_id": comment[1],
+                                       "username": comment[2]}
+    return arguments, per_view
+
+
+def url_list():
+    """(имя, путь) для всех GET-адресов posts.urls и posts.api_urls."""
+    arguments, per_view = sample_arguments()
+    result = []
+    for module in (urls, api_urls):
+        for pattern in module.urlpatterns:
+            if not isinstance(pattern, URLPattern) or pattern.name in SKIP:
+                continue
+            values = {**arguments, **per_view.get(pattern.name, {})}
+            kwargs = {name: values[name]
+                      for name in pattern.pattern.converters}
+            result.append((pattern.name,
+                           reverse(pattern.name, kwargs=kwargs)))
+    return result
+
+
+def measure(client, path, repeat):
+    """Холодный запрос после очистки кэша и repeat тёплых."""
+    cache.clear()
+    timings, queries, rows = [], [], []
+    status = None
+    for _ in range(repeat + 1):
+        counter = RowCounter()
+        with CaptureQueriesContext(connection) as captured, \
+                connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            response = client.get(path)
+            elapsed = (time.perf_counter() - started) * 1000
+        status = response.status_code
+        timings.append(elapsed)
+        queries.append(len(captured))
+        rows.append(counter.rows)
+    cold, warm = timings[0], timings[1:] or timings
+    result = {"path": path, "status": status,
+              "cold_ms": round(cold, 2),
+              "cold_queries": queries[0],
+              "cold_rows": rows[0],
+              "queries": statistics.median(queries[1:] or queries),
+              "rows": statistics.median(rows[1:] or rows),
+              "max_ms": round(max(warm), 2)}
+    for share in PERCENTILES:
+        result[f"p{share}_ms"] = round(percentile(warm, share), 2)
+    return result
+
+
+class Command(BaseCommand):
+    help = ("Замеряет все страницы posts.urls и API на наборах данных "
+            "разного объёма и пишет результаты в JSON")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tier", action="append", dest="tiers",
+                            choices=sorted(TIERS),
+                            help="объём данных (можно несколько раз); "
+                                 "по умолчанию small")
+        parser.add_argument("--existing", action="store_true",
+                            help="мерить текущую базу, не создавая "
+                                 "тестовую")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--output", default="benchmark.json")
+
+    def handle(self, *args, tiers, existing, repeat, output, **options):
+        report = {"created": timezone.now().isoformat(),
+                  "python": platform.python_version(),
+                  "django": django.get_version(),
+                  "database": connection.vendor,
+                  "repeat": repeat,
+                  "tiers": {}}
+        # Отдельный файл кэша, чтобы не трогать кэш рабочего сервера
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+                CACHES={"default": {
+                    "BACKEND": "yatube.cache.SQLiteCache",
+                    "LOCATION": f"{directory}/cache.sqlite3"}},
+                ALLOWED_HOSTS=["*"]):
+            if existing:
+                report["tiers"]["existing"] = self.run(repeat)
+            else:
+                for tier in tiers or ["small"]:
+                    with override_settings(MEDIA_ROOT=directory):
+                        report["tiers"][tier] = self.run_tier(tier, repeat)
+        with open(output, "w", encoding="utf-8") as target:
+            json.dump(report, target, ensure_ascii=False, indent=2)
+        self.stdout.write(f"Результаты записаны в {output}")
+
+    def run_tier(self, tier, repeat):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0,
+                                                      autoclobber=True)
+        try:
+            started = time.monotonic()
+            call_command("generate_dataset", **TIERS[tier],
+                         stdout=self.stdout)
+            self.stdout.write(f"{tier}: данные за "
+                              f"{time.monotonic() - started:.0f} с")
+            return {"dataset": TIERS[tier], "urls": self.run(repeat)}
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, repeat):
+        reader = (User.objects.order_by("-stats__following_count")
+                  .first())
+        client = Client()
+        if reader is not None:
+            client.force_login(reader)
+        results = {}
+        for name, path in url_list():
+            results[name] = measure(client, path, repeat)
+            row = results[name]
+            self.stdout.write(
+                f"{name:20} p50 {row['p50_ms']:8.2f} мс  "
+                f"p99 {row['p99_ms']:8.2f} мс  "
+                f"запросов {row['queries']:4}  строк {row['rows']}")
+        return results
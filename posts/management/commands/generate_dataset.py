@@ -0,0 +1,138 @@
+import json
+import os
+import random
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from PIL import Image
+
+# Пароль всех сгенерированных пользователей
+PASSWORD = "dataset"
+# Показатель степенного распределения популярности авторов и постов
+ALPHA = 1.1
+REPLY_PROBABILITY = 0.3
+
+
+def zipf_weights(count, alpha=ALPHA):
+    """Накопленные веса 1 / rank^alpha для random.choices."""
+    return list(accumulate(1 / (rank ** alpha)
+                           for rank in range(1, count + 1)))
+
+
+def make_images(count, rng):
+    """Несколько небольших картинок в хранилище; посты их разделяют."""
+    names = []
+    for i in range(count):
+        buffer = BytesIO()
+        color = tuple(rng.randrange(256) for _ in range(3))
+        Image.new("RGB", (1200, 800), color).save(buffer, "JPEG")
+        names.append(default_storage.save(f"posts/dataset_{i}.jpg",
+                                          ContentFile(buffer.getvalue())))
+    return names
+
+
+class Command(BaseCommand):
+    help = ("Генерирует реалистичный набор данных: степенное распределение "
+            "подписчиков, посты с картинками, комментарии к популярным "
+            "постам")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--posts", type=int, default=10000)
+        parser.add_argument("--comments", type=int, default=30000)
+        parser.add_argument("--groups", type=int, default=20)
+        parser.add_argument("--follows-per-user", type=int, default=20,
+                            help="среднее число подписок пользователя")
+        parser.add_argument("--image-ratio", type=float, default=0.3,
+                            help="доля постов с картинкой")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        with tempfile.TemporaryDirectory() as directory:
+            files = self.write(directory, rng, options)
+            call_command("import_content", *files,
+                         batch_size=options["batch_size"],
+                         stdout=self.stdout)
+
+    def write(self, directory, rng, options):
+        users, posts = options["users"], options["posts"]
+        now = timezone.now()
+        password = make_password(PASSWORD)
+        authors = zipf_weights(users)
+        files = []
+
+        def dump(kind, rows):
+            path = os.path.join(directory, f"{kind}.jsonl")
+            with open(path, "w", encoding="utf-8") as target:
+                for row in rows:
+                    target.write(json.dumps(row, ensure_ascii=False))
+                    target.write("\n")
+            files.append(path)
+
+        dump("users", ({"id": i, "username": f"user{i}",
+                        "first_name": f"Пользователь {i}",
+                        "password": password}
+                       for i in range(1, users + 1)))
+        dump("groups", ({"id": i, "slug": f"group{i}",
+                         "title": f"Группа {i}"}
+                        for i in range(1, options["groups"] + 1)))
+
+        def follows():
+            for user in range(1, users + 1):
+                count = min(users - 1, max(1, int(rng.expovariate(
+                    1 / options["follows_per_user"]))))
+                chosen = set(rng.choices(range(1, users + 1),
+                                         cum_weights=authors, k=count))
+                chosen.discard(user)
+                for author in chosen:
+                    yield {"user": user, "author": author}
+        dump("follows", follows())
+
+        images = make_images(8, rng) if options["image_ratio"] else []
+        dates = sorted(now - timedelta(minutes=rng.randrange(525600))
+                       for _ in range(posts))
+
+        def post_rows():
+            for i, date in enumerate(dates, start=1):
+                row = {"id": i,
+                       "author": rng.choices(range(1, users + 1),
+                                             cum_weights=authors)[0],
+                       "text": f"Пост {i} " + "текст " * rng.randrange(5, 60),
+                       "pub_date": date.isoformat()}
+                if rng.random() < options["image_ratio"]:
+                    row["image"] = rng.choice(images)
+                if rng.random() < 0.5:
+                    row["group"] = rng.randrange(1, options["groups"] + 1)
+                yield row
+        dump("posts", post_rows())
+
+        def comment_rows():
+            # Самые свежие посты - самые популярные
+            popular = zipf_weights(posts)
+            threads = {}
+            for i in range(1, options["comments"] + 1):
+                post = posts - rng.choices(range(posts),
+                                           cum_weights=popular)[0]
+                row = {"id": i, "post": post,
+                       "author": rng.randrange(1, users + 1),
+                       "text": f"Комментарий {i}",
+                       "created": (dates[post - 1] + timedelta(
+                           minutes=i % 1440)).isoformat()}
+                earlier = threads.setdefault(post, [])
+                if earlier and rng.random() < REPLY_PROBABILITY:
+                    row["parent"] = rng.choice(earlier)
+                earlier.append(i)
+                yield row
+        if posts:
+            dump("comments", comment_rows())
+        return files
@@ -0,0 +1,239 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import threads, thumbnails, versions
+from posts.models import Comment, Follow, Group, Post, User
+
+# Порядок импорта: внешние ключи ссылаются только на уже загруженное
+KINDS = ("users", "groups", "posts", "comments", "follows")
+
+
+def insert(model, objs, ignore_conflicts=False):
+    """INSERT пачки объектов без pre_save полей, как loaddata (raw): даты
+    из файла не затираются auto_now_add, а общие для процесса объекты
+    полей модели не меняются. Значения всех полей задаёт Importer."""
+    fields = model._meta.concrete_fields
+    if objs[0].pk is None:
+        fields = [field for field in fields if not field.primary_key]
+    batch_size = connection.ops.bulk_batch_size(fields, objs)
+    for start in range(0, len(objs), batch_size):
+        model._base_manager._insert(objs[start:start + batch_size], fields,
+                                    raw=True,
+                                    ignore_conflicts=ignore_conflicts)
+
+
+def read_rows(path):
+    """Строки файла словарями: JSONL или CSV по расширению."""
+    with open(path, newline="", encoding="utf-8") as source:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def date(value):
+    if not value:
+        return timezone.now()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Неверная дата: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Importer:
+    """Переводит строки файлов в объекты моделей. Первичные ключи
+    раздаются заранее, поэтому внешние ключи разрешаются по словарям
+    "id в файле -> id в базе" без запросов и без возврата id из
+    bulk_create."""
+
+    def __init__(self):
+        self.ids = {kind: {} for kind in KINDS}
+        # id комментария в файле -> path в базе, для ответов
+        self.paths = {}
+        self.next_pk = {}
+        # Ленты, которые надо сбросить после импорта
+        self.scopes = {"global"}
+        # Посты с картинками: превью готовит thumbnail_worker
+        self.with_images = []
+        self.existing_users = dict(
+            User.objects.values_list("username", "pk"))
+        self.existing_groups = dict(Group.objects.values_list("slug", "pk"))
+
+    def allocate(self, model):
+        if model not in self.next_pk:
+            self.next_pk[model] = (
+                model.objects.aggregate(top=Max("pk"))["top"] or 0)
+        self.next_pk[model] += 1
+        return self.next_pk[model]
+
+    def ref(self, kind, value):
+        if value in (None, ""):
+            return None
+        return self.ids[kind].get(str(value))
+
+    def users(self, row):
+        pk = self.existing_users.get(row["username"])
+        if pk is not None:
+            # Уже в базе или раньше в файле: ссылки ведут на первого
+            self.ids["users"][str(row["id"])] = pk
+            return None
+        pk = self.existing_users[row["username"]] = self.allocate(User)
+        user = User(pk=pk, username=row["username"],
+                    first_name=row.get("first_name") or "",
+                    last_name=row.get("last_name") or "",
+                    email=row.get("email") or "",
+                    password=row.get("password") or make_password(None),
+                    date_joined=date(row.get("date_joined")))
+        return str(row["id"]), user
+
+    def groups(self, row):
+        pk = self.existing_groups.get(row["slug"])
+        if pk is not None:
+            self.ids["groups"][str(row["id"])] = pk
+            return None
+        pk = self.existing_groups[row["slug"]] = self.allocate(Group)
+        group = Group(pk=pk, slug=row["slug"],
+                      title=row["title"],
+                      description=row.get("description") or "")
+        return str(row["id"]), group
+
+    def posts(self, row):
+        author_id = self.ref("users", row["author"])
+        if author_id is None:
+            return None
+        pub_date = date(row.get("pub_date"))
+        post = Post(pk=self.allocate(Post), author_id=author_id,
+                    group_id=self.ref("groups", row.get("group")),
+                    text=row["text"], image=row.get("image") or None,
+                    pub_date=pub_date, updated=pub_date)
+        self.scopes.add(versions.author_scope(author_id))
+        if post.image:
+            self.with_images.append(post.pk)
+        if post.group_id is not None:
+            self.scopes.add(versions.group_scope(post.group_id))
+        return str(row["id"]), post
+
+    def comments(self, row):
+        post_id = self.ref("posts", row["post"])
+        author_id = self.ref("users", row["author"])
+        if post_id is None or author_id is None:
+            return None
+        parent = str(row.get("parent") or "")
+        # Родитель должен идти в файле раньше ответа, иначе ответ
+        # пропускается, а не становится корневым комментарием
+        if parent and parent not in self.paths:
+            return None
+        pk = self.allocate(Comment)
+        parent_path = self.paths.get(parent, "")
+        parent_id, path, depth = threads.locate(parent_path, pk)
+        self.paths[str(row["id"])] = path
+        comment = Comment(pk=pk, post_id=post_id, author_id=author_id,
+                          parent_id=parent_id, path=path, depth=depth,
+                          text=row["text"], created=date(row.get("created")))
+        return str(row["id"]), comment
+
+    def follows(self, row):
+        user_id = self.ref("users", row["user"])
+        author_id = self.ref("users", row["author"])
+        if user_id is None or author_id is None or user_id == author_id:
+            return None
+        follow = Follow(user_id=user_id, author_id=author_id,
+                        subscribe_date=date(row.get("subscribe_date")))
+        self.scopes.update(("follows", versions.follows_scope(user_id),
+                            versions.author_scope(author_id)))
+        return None, follow
+
+
+class Command(BaseCommand):
+    help = ("Массовый импорт пользователей, групп, постов, комментариев "
+            "и подписок из JSONL/CSV")
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+",
+                            help="users.jsonl, posts.csv, ...; тип данных "
+                                 "- по имени файла")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--skip-rebuild", action="store_true",
+                            help="не пересчитывать счётчики и ленты")
+
+    def handle(self, *args, files, batch_size, skip_rebuild, **options):
+        by_kind = {}
+        for path in files:
+            name = os.path.basename(path)
+            kind = next((kind for kind in KINDS if name.startswith(kind)),
+                        None)
+            if kind is None:
+                raise CommandError(
+                    f"{path}: имя файла должно начинаться с одного из "
+                    f"{', '.join(KINDS)}")
+            by_kind.setdefault(kind, []).append(path)
+
+        importer = Importer()
+        for kind in KINDS:
+            for path in by_kind.get(kind, []):
+                self.load(importer, kind, path, batch_size)
+
+        models = [User, Group, Post, Comment, Follow]
+        with connection.cursor() as cursor:
+            # Для баз с последовательностями (PostgreSQL): id раздавались
+            # вручную
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+        if importer.with_images:
+            count = thumbnails.enqueue_many(importer.with_images)
+            self.stdout.write(f"В очереди превью: {count} постов")
+        if not skip_rebuild:
+            call_command("rebuild_counters", stdout=self.stdout)
+            call_command("rebuild_timeline", stdout=self.stdout)
+        versions.bump(*importer.scopes)
+
+    def load(self, importer, kind, path, batch_size):
+        build = getattr(importer, kind)
+        started = time.monotonic()
+        total = skipped = 0
+        rows = read_rows(path)
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            batch, ids = [], []
+            for number, row in enumerate(chunk, start=total + 1):
+                try:
+                    built = build(row)
+                except (KeyError, ValueError) as error:
+                    raise CommandError(f"{path}, строка {number}: {error}")
+                if built is None:
+                    skipped += 1
+                    continue
+                source_id, obj = built
+                batch.append(obj)
+                ids.append(source_id)
+            if batch:
+                with transaction.atomic():
+                    insert(type(batch[0]), batch,
+                           ignore_conflicts=kind == "follows")
+            for source_id, obj in zip(ids, batch):
+                if source_id is not None:
+                    importer.ids[kind][source_id] = obj.pk
+            total += len(chunk)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"{kind}: {total} строк за {elapsed:.1f} с "
+            f"({total / max(elapsed, 1e-6):.0f} строк/с), "
+            f"пропущено {skipped}")
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from posts import threads
+from posts.models import Comment, Follow, Post, User, UserStats
+
+
+def count_of(model, field, outer):
+    """Подзапрос COUNT(*) по внешнему ключу field для строки снаружи."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef(outer)})
+        .order_by().values(field)
+        .annotate(total=Count("pk")).values("total")
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает хранимые счётчики постов, комментариев, "
+            "ответов и подписок")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            missing = User.objects.filter(stats__isnull=True)
+            created = UserStats.objects.bulk_create(
+                UserStats(user_id=pk)
+                for pk in missing.values_list("pk", flat=True)
+            )
+            # updated - чтобы карточки с прежним числом комментариев
+            # не брались из кэша
+            posts = Post.objects.update(
+                comment_count=count_of(Comment, "post", "pk"),
+                updated=timezone.now())
+            users = UserStats.objects.update(
+                posts_count=count_of(Post, "author", "user_id"),
+                followers_count=count_of(Follow, "author", "user_id"),
+                following_count=count_of(Follow, "user", "user_id"),
+            )
+            comments = threads.rebuild_reply_counts()
+        self.stdout.write(
+            f"Посты: {posts}, комментарии: {comments}, "
+            f"пользователи: {users} "
+            f"(новых строк счётчиков: {len(created)})"
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = "Пересобирает материализованные ленты подписок"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append",
+                            dest="user_ids",
+                            help="id пользователя (можно несколько раз)")
+
+    def handle(self, *args, user_ids=None, **options):
+        with transaction.atomic():
+            timeline.rebuild(user_ids)
+        entries = TimelineEntry.objects.all()
+        if user_ids:
+            entries = entries.filter(user_id__in=user_ids)
+        self.stdout.write(f"Строк в лентах: {entries.count()}")
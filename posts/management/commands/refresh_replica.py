@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from yatube import replica
+
+
+class Command(BaseCommand):
+    help = ("Копирует основную базу SQLite в реплику для чтения лент; "
+            "без --once повторяет каждые --interval секунд")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float,
+                            default=settings.REPLICA_REFRESH_INTERVAL)
+        parser.add_argument("--once", action="store_true")
+        parser.add_argument("--status", action="store_true",
+                            help="показать отставание реплики и выйти")
+
+    def handle(self, *args, interval, once, status, **options):
+        if not replica.enabled():
+            raise CommandError("Реплика не настроена: задайте "
+                               "YATUBE_REPLICA_DB")
+        if status:
+            lag = replica.replica_lag()
+            self.stdout.write("Реплика не обновлялась" if lag is None
+                              else f"Отставание реплики: {lag:.3f} с")
+            return
+        source = settings.DATABASES["default"]["NAME"]
+        target = settings.DATABASES[replica.REPLICA]["NAME"]
+        while True:
+            elapsed = replica.refresh(source, target)
+            if options["verbosity"] > 1 or once:
+                self.stdout.write(f"Реплика обновлена за {elapsed:.3f} с")
+            if once:
+                break
+            time.sleep(max(0, interval - elapsed))
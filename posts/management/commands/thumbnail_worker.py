@@ -0,0 +1,76 @@
+import logging
+import multiprocessing
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+
+logger = logging.getLogger(__name__)
+
+
+def close_connections():
+    # Соединения с базой не должны переходить в дочерние процессы
+    connections.close_all()
+
+
+def run_job(post_id):
+    try:
+        thumbnails.generate(post_id)
+    except Exception:
+        logger.exception("Не удалось сделать превью поста %s", post_id)
+        return False
+    return True
+
+
+class Command(BaseCommand):
+    help = "Готовит превью картинок постов из очереди в пуле процессов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int,
+                            default=multiprocessing.cpu_count(),
+                            help="размер пула; 0 - в текущем процессе")
+        parser.add_argument("--batch", type=int, default=20)
+        parser.add_argument("--interval", type=float, default=1.0,
+                            help="пауза, когда очередь пуста, секунд")
+        parser.add_argument("--once", action="store_true",
+                            help="разобрать очередь и выйти")
+        parser.add_argument("--enqueue-all", action="store_true",
+                            help="сначала поставить в очередь все посты "
+                                 "с картинками (после смены GEOMETRIES)")
+
+    def handle(self, *args, processes, batch, interval, once, enqueue_all,
+               **options):
+        if enqueue_all:
+            queued = thumbnails.enqueue_all()
+            self.stdout.write(f"В очереди постов: {queued}")
+        token = uuid.uuid4().hex
+        pool = None
+        if processes:
+            close_connections()
+            pool = multiprocessing.Pool(processes,
+                                        initializer=close_connections)
+        done = 0
+        try:
+            while True:
+                jobs = thumbnails.claim(token, batch)
+                if not jobs:
+                    if once:
+                        break
+                    time.sleep(interval)
+                    continue
+                post_ids = [job.post_id for job in jobs]
+                if pool is None:
+                    results = [run_job(post_id) for post_id in post_ids]
+                else:
+                    results = pool.map(run_job, post_ids)
+                for job, ok in zip(jobs, results):
+                    thumbnails.finish(job, ok)
+                done += sum(results)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        self.stdout.write(f"Готово превью: {done}")
@@ -0,0 +1,43 @@
+import logging
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ("Раскладывает по лентам подписчиков посты авторов, "
+            "переставших быть знаменитостями")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=5)
+        parser.add_argument("--interval", type=float, default=5.0,
+                            help="пауза, когда очередь пуста, секунд")
+        parser.add_argument("--once", action="store_true",
+                            help="разобрать очередь и выйти")
+
+    def handle(self, *args, batch, interval, once, **options):
+        token = uuid.uuid4().hex
+        done = 0
+        while True:
+            jobs = timeline.claim(token, batch)
+            if not jobs:
+                if once:
+                    break
+                time.sleep(interval)
+                continue
+            for job in jobs:
+                try:
+                    timeline.demote_job(job.author_id)
+                except Exception:
+                    logger.exception("Не удалось разложить посты автора %s",
+                                     job.author_id)
+                    # Задание выдадут снова через CLAIM_TIMEOUT
+                    continue
+                job.delete()
+                done += 1
+        self.stdout.write(f"Разложено авторов: {done}")
@@ -0,0 +1,62 @@
+# Generated by Django 2.2.6 on 2026-10-18 17:39
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    # Из-за unique_together = ['user'], которого не было в базе, одна
+    # подписка могла сохраниться несколько раз; остаётся самая ранняя
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    duplicates = (Follow.objects.values('user_id', 'author_id')
+                  .annotate(first=Min('pk'), copies=Count('pk'))
+                  .filter(copies__gt=1))
+    users = set()
+    for row in list(duplicates):
+        Follow.objects.filter(user_id=row['user_id'],
+                              author_id=row['author_id']).exclude(
+            pk=row['first']).delete()
+        users.update((row['user_id'], row['author_id']))
+    for user_id in users:
+        UserStats.objects.filter(user_id=user_id).update(
+            followers_count=Follow.objects.filter(author_id=user_id).count(),
+            following_count=Follow.objects.filter(user_id=user_id).count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0016_comment_threads'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_follows,
+                             migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='follow',
+            unique_together={('user', 'author')},
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='posts_comment_post_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['user', 'subscribe_date'], name='posts_follow_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'subscribe_date'], name='posts_follow_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'pub_date'], name='posts_post_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'pub_date'], name='posts_post_group_date_idx'),
+        ),
+    ]
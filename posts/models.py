@@ -1,6 +1,6 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 
 User = get_user_model()
 
@@ -14,8 +14,27 @@ class Group(models.Model):
         return f"{format(self.title)}"
 
 
-class Post(models.Model):
-    objects = None
+class CountedModel(models.Model):
+    """Сохранение вместе с обновлением счётчиков (см. posts.signals)
+    в одной транзакции."""
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для ленты: автор и группа одним JOIN, число комментариев
+        хранится в самом посте, поэтому карточка не делает своих запросов."""
+        return self.select_related("author", "group")
+
+
+class Post(CountedModel):
+    objects = PostQuerySet.as_manager()
     text = models.TextField()
     pub_date = models.DateTimeField("date published",
                                     auto_now_add=True,
@@ -32,15 +51,26 @@ class Post(models.Model):
         related_name="posts",
     )
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    comment_count = models.PositiveIntegerField(default=0)
+    # Меняется при правке поста, его комментариев и готовности превью:
+    # ключ кэша карточки в ленте (includes/post_item.html)
+    updated = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-pub_date"]
+        indexes = [
+            # Ленты профиля и группы: фильтр и сортировка одним индексом
+            models.Index(fields=["author", "pub_date"],
+                         name="posts_post_author_date_idx"),
+            models.Index(fields=["group", "pub_date"],
+                         name="posts_post_group_date_idx"),
+        ]
 
     def __str__(self):
         return self.text
 
 
-class Comment(models.Model):
+class Comment(CountedModel):
     objects = None
     post = models.ForeignKey(Post,
                              on_delete=models.CASCADE,
@@ -52,15 +82,36 @@ class Comment(models.Model):
     created = models.DateTimeField("date published",
                                    auto_now_add=True,
                                    db_index=True)
+    parent = models.ForeignKey("self",
+                               on_delete=models.CASCADE,
+                               blank=True,
+                               null=True,
+                               related_name="replies")
+    # Материализованный путь: id предков и свой, см. posts.threads
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Число ответов во всём поддереве, а не только прямых
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            # Ветка или поддерево - один диапазон по path
+            models.Index(fields=["post", "path"],
+                         name="posts_comment_thread_idx"),
+            # Страница корневых комментариев поста
+            models.Index(fields=["post", "parent", "created"],
+                         name="posts_comment_roots_idx"),
+            # Все комментарии поста по дате (API)
+            models.Index(fields=["post", "created"],
+                         name="posts_comment_post_date_idx"),
+        ]
 
     def __str__(self):
         return self.text
 
 
-class Follow(models.Model):
+class Follow(CountedModel):
     objects = None
     user = models.ForeignKey(User, on_delete=models.CASCADE,
                              related_name="follower")  # Кто подписывается
@@ -73,4 +124,96 @@ class Follow(models.Model):
 
     class Meta:
         ordering = ["-subscribe_date"]
-        unique_together = ['user']
+        unique_together = ["user", "author"]
+        indexes = [
+            # Подписки и подписчики по дате
+            models.Index(fields=["user", "subscribe_date"],
+                         name="posts_follow_user_date_idx"),
+            models.Index(fields=["author", "subscribe_date"],
+                         name="posts_follow_author_date_idx"),
+        ]
+
+
+class UserStats(models.Model):
+    """Хранимые счётчики пользователя для шапки профиля."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                related_name="stats")
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Посты не раскладываются по лентам, а подмешиваются при чтении,
+    # см. posts.timeline
+    celebrity = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.user}"
+
+    @classmethod
+    def for_user(cls, user):
+        try:
+            return user.stats
+        except cls.DoesNotExist:
+            return cls.rebuild(user.pk)
+
+    @classmethod
+    def rebuild(cls, user_id):
+        """Пересчитывает счётчики одного пользователя с нуля."""
+        stats, _ = cls.objects.update_or_create(
+            user_id=user_id,
+            defaults={
+                "posts_count": Post.objects.filter(author_id=user_id).count(),
+                "followers_count": Follow.objects.filter(
+                    author_id=user_id).count(),
+                "following_count": Follow.objects.filter(
+                    user_id=user_id).count(),
+            },
+        )
+        return stats
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: строка на каждый пост автора,
+    на которого подписан user. Заполняется при публикации (fan-out),
+    см. posts.timeline."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="timeline")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="timeline_entries")
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="+")
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ["user", "post"]
+        indexes = [
+            models.Index(fields=["user", "pub_date", "post"],
+                         name="posts_timeline_feed_idx"),
+            models.Index(fields=["user", "author"],
+                         name="posts_timeline_author_idx"),
+        ]
+
+
+class ThumbnailJob(models.Model):
+    """Задание на подготовку превью картинки поста, см. posts.thumbnails."""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="thumbnail_jobs")
+    created = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claimed_by = models.CharField(max_length=32, blank=True, db_index=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["pk"]
+
+
+class TimelineJob(models.Model):
+    """Задание разложить посты автора, переставшего быть знаменитостью,
+    по лентам его подписчиков, см. posts.timeline."""
+    author = models.OneToOneField(User, on_delete=models.CASCADE,
+                                  related_name="+")
+    created = models.DateTimeField(auto_now_add=True)
+    claimed_by = models.CharField(max_length=32, blank=True, db_index=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["pk"]
@@ -0,0 +1,171 @@
+import base64
+import binascii
+import hashlib
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Max, Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from . import versions
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+# Больше строк (по оценке) - COUNT(*) без фильтров не выполняется
+ESTIMATE_ABOVE = 100000
+COUNT_CACHE_TIMEOUT = 5 * 60
+
+# Направления курсора: n - следующая (более старая) страница,
+# p - предыдущая (более новая).
+NEXT = 'n'
+PREVIOUS = 'p'
+
+# Наибольший INTEGER в SQLite: id больше этого из курсора или параметра
+# запроса база не примет (OverflowError)
+MAX_PK = 2 ** 63 - 1
+
+
+def encode_cursor(direction, value, pk):
+    """Упаковывает позицию (значение поля сортировки, id) в непрозрачную
+    строку для параметра ?cursor=."""
+    raw = f'{direction}|{value.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (direction, value, pk) или None для пустого
+    или испорченного курсора."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, value, pk = raw.decode().split('|')
+        pk = int(pk)
+        # Дата правильного формата может быть невозможной: месяц 13
+        value = parse_datetime(value)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    if (direction not in (NEXT, PREVIOUS) or value is None
+            or not 1 <= pk <= MAX_PK):
+        return None
+    return direction, value, pk
+
+
+def read_cursor(request):
+    """Возвращает (token, cursor) из ?cursor=; испорченный курсор
+    считается отсутствующим."""
+    token = request.GET.get('cursor')
+    cursor = decode_cursor(token)
+    if cursor is None:
+        return None, None
+    return token, cursor
+
+
+def window(queryset, cursor, per_page, field='pub_date', tiebreak='pk'):
+    """Выбирает до per_page + 1 строк за позицией курсора.
+
+    Строки идут в порядке обхода: для NEXT от новых к старым,
+    для PREVIOUS от старых к новым.
+    """
+    if cursor is None or cursor[0] == NEXT:
+        order = (f'-{field}', f'-{tiebreak}')
+    else:
+        order = (field, tiebreak)
+    if cursor is not None:
+        direction, value, pk = cursor
+        lookup = 'lt' if direction == NEXT else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{field}__{lookup}': value})
+            | Q(**{field: value, f'{tiebreak}__{lookup}': pk})
+        )
+    return list(queryset.order_by(*order)[:per_page + 1])
+
+
+def _value(row, name):
+    # Строки - модели или словари из values()
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+def build_page(rows, token, cursor, per_page, field='pub_date'):
+    """Собирает (paginator, page) из строк, выбранных window()."""
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if cursor is None or cursor[0] == NEXT:
+        has_next, has_previous = has_more, cursor is not None
+    else:
+        rows.reverse()
+        has_next, has_previous = True, has_more
+
+    paginator = Paginator(rows, per_page)
+    page = paginator.page(1)
+    page.cursor = token
+    page.next_cursor = None
+    page.previous_cursor = None
+    if rows and has_next:
+        last = rows[-1]
+        page.next_cursor = encode_cursor(
+            NEXT, _value(last, field), _value(last, 'pk'))
+    if rows and has_previous:
+        first = rows[0]
+        page.previous_cursor = encode_cursor(
+            PREVIOUS, _value(first, field), _value(first, 'pk'))
+    return paginator, page
+
+
+def paginate(request, queryset, per_page=POSTS_PER_PAGE, field='pub_date'):
+    """Keyset-пагинация по (field, id) от новых записей к старым.
+
+    Вместо OFFSET и COUNT(*) выбирается per_page + 1 строка после позиции
+    из курсора, поэтому глубокие страницы стоят столько же, сколько первая.
+    Возвращает (paginator, page) со стандартными типами Django; ссылки
+    на соседние страницы лежат в page.next_cursor и page.previous_cursor.
+    """
+    token, cursor = read_cursor(request)
+    rows = window(queryset, cursor, per_page, field)
+    return build_page(rows, token, cursor, per_page, field)
+
+
+class CountCachedPaginator(Paginator):
+    """Paginator для страниц с номерами (админка): COUNT(*) по queryset
+    кэшируется под версиями лент scopes (см. posts.versions), а для
+    таблицы без фильтров больше ESTIMATE_ABOVE строк заменяется оценкой
+    MAX(id). Тогда estimated = True (админка пишет "около N"), а последние
+    страницы могут оказаться пустыми."""
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, scopes=()):
+        super().__init__(object_list, per_page, orphans,
+                         allow_empty_first_page)
+        self.scopes = scopes
+        self.estimated = False
+
+    def _cache_key(self):
+        sql, params = self.object_list.query.sql_with_params()
+        raw = "|".join((sql, repr(params),
+                        "-".join(map(str, versions.get_versions(
+                            *self.scopes)))))
+        return f"paginator_count:{hashlib.md5(raw.encode()).hexdigest()}"
+
+    def _estimate(self):
+        if self.object_list.query.where:
+            return None
+        model = self.object_list.model
+        top = model._default_manager.aggregate(top=Max("pk"))["top"]
+        return top if top and top > ESTIMATE_ABOVE else None
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        key = self._cache_key()
+        cached = cache.get(key)
+        if cached is not None:
+            self.estimated, count = cached
+            return count
+        count = self._estimate()
+        self.estimated = count is not None
+        if count is None:
+            count = self.object_list.count()
+        cache.set(key, (self.estimated, count), COUNT_CACHE_TIMEOUT)
+        return count
@@ -0,0 +1,183 @@
+"""Полнотекстовый поиск по постам на индексе SQLite FTS5.
+
+Индекс posts_post_fts - внешняя таблица содержимого (content=posts_post):
+сам текст хранится только в posts_post, а FTS5 держит инвертированный
+индекс. Синхронизацию при вставке, изменении и удалении постов делают
+триггеры, поэтому индекс не расходится и при bulk_create или update().
+Django пересоздаёт таблицу при некоторых миграциях SQLite вместе
+с триггерами, поэтому install() вызывается и после каждого migrate.
+"""
+import base64
+import binascii
+import math
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .pagination import MAX_PK
+
+FTS_TABLE = "posts_post_fts"
+
+INSTALL_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, author_id UNINDEXED, group_id UNINDEXED,
+        content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, text, author_id, group_id)
+        VALUES (new.id, new.text, new.author_id, new.group_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text, author_id, group_id)
+        VALUES ('delete', old.id, old.text, old.author_id, old.group_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF text, author_id, group_id ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text, author_id, group_id)
+        VALUES ('delete', old.id, old.text, old.author_id, old.group_id);
+        INSERT INTO {FTS_TABLE} (rowid, text, author_id, group_id)
+        VALUES (new.id, new.text, new.author_id, new.group_id);
+    END""",
+]
+
+UNINSTALL_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+RESULTS_PER_PAGE = 10
+FACETS_LIMIT = 10
+
+
+def available(using=connection):
+    return using.vendor == "sqlite"
+
+
+def install(using=connection, rebuild=False):
+    """Создаёт индекс и триггеры, если их нет; rebuild=True заново
+    строит индекс по всем постам."""
+    if not available(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+        created = cursor.fetchone() is None
+        for sql in INSTALL_SQL:
+            cursor.execute(sql)
+        if created or rebuild:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(using=connection):
+    if not available(using):
+        return
+    with using.cursor() as cursor:
+        for sql in UNINSTALL_SQL:
+            cursor.execute(sql)
+
+
+def match_expression(query):
+    """Переводит пользовательский запрос в выражение MATCH: каждое слово
+    в кавычках (чтобы не сработал синтаксис FTS5), последнее - как
+    префикс. Пустая строка, если слов нет."""
+    words = re.findall(r"\w+", query)
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def matching_ids(query):
+    """RawSQL с id найденных постов для фильтра pk__in."""
+    return RawSQL(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+        [match_expression(query)])
+
+
+def encode_cursor(rank, pk):
+    raw = f"{rank!r}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        rank, pk = raw.decode().split("|")
+        rank, pk = float(rank), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    # float() принимает и nan/inf, а такой ранг не сравним с настоящими
+    if not math.isfinite(rank) or not 1 <= pk <= MAX_PK:
+        return None
+    return rank, pk
+
+
+def _filters(expression, author_id, group_id):
+    where = [f"{FTS_TABLE} MATCH %s"]
+    params = [expression]
+    if author_id is not None:
+        where.append("p.author_id = %s")
+        params.append(author_id)
+    if group_id is not None:
+        where.append("p.group_id = %s")
+        params.append(group_id)
+    return where, params
+
+
+def search(query, author_id=None, group_id=None, cursor=None,
+           per_page=RESULTS_PER_PAGE):
+    """Возвращает (ids, next_cursor): id постов по убыванию релевантности
+    (bm25) и курсор следующей страницы."""
+    expression = match_expression(query)
+    if not expression:
+        return [], None
+    where, params = _filters(expression, author_id, group_id)
+    position = decode_cursor(cursor)
+    if position is not None:
+        rank, pk = position
+        where.append(f"({FTS_TABLE}.rank > %s "
+                     f"OR ({FTS_TABLE}.rank = %s AND p.id > %s))")
+        params += [rank, rank, pk]
+    with connection.cursor() as db:
+        db.execute(
+            f"SELECT p.id, {FTS_TABLE}.rank FROM {FTS_TABLE} "
+            f"JOIN posts_post p ON p.id = {FTS_TABLE}.rowid "
+            f"WHERE {' AND '.join(where)} "
+            f"ORDER BY {FTS_TABLE}.rank, p.id LIMIT %s",
+            params + [per_page + 1])
+        rows = db.fetchall()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    return [pk for pk, rank in rows], next_cursor
+
+
+def facets(query, author_id=None, group_id=None, limit=FACETS_LIMIT):
+    """Число найденных постов по авторам и по группам:
+    {"author": [(id, count), ...], "group": [...]}."""
+    expression = match_expression(query)
+    result = {"author": [], "group": []}
+    if not expression:
+        return result
+    where, params = _filters(expression, author_id, group_id)
+    with connection.cursor() as db:
+        for facet in result:
+            db.execute(
+                f"SELECT p.{facet}_id, COUNT(*) FROM {FTS_TABLE} "
+                f"JOIN posts_post p ON p.id = {FTS_TABLE}.rowid "
+                f"WHERE {' AND '.join(where)} AND p.{facet}_id IS NOT NULL "
+                f"GROUP BY p.{facet}_id ORDER BY 2 DESC LIMIT %s",
+                params + [limit])
+            result[facet] = db.fetchall()
+    return result
@@ -0,0 +1,103 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import threads, timeline, versions
+from .follow_graph import follow_graph
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def bump_user(user_id, field, delta):
+    """Сдвигает счётчик пользователя на delta через F(), без чтения строки.
+    Если при увеличении строки со счётчиками ещё нет, она собирается
+    пересчётом. При уменьшении отсутствующую строку не создаём: её могли
+    удалить каскадом вместе с пользователем."""
+    stats = UserStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats.filter(**{f"{field}__gt": 0}).update(**{field: F(field) + delta})
+    elif not stats.update(**{field: F(field) + delta}):
+        UserStats.rebuild(user_id)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_user(instance.author_id, "posts_count", 1)
+        timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump_user(instance.author_id, "posts_count", -1)
+    versions.bump_post(instance.author_id, instance.group_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    # При редактировании пост может уйти из прежней группы,
+    # её ленту тоже нужно сбросить
+    instance.previous_group_id = None
+    if instance.pk and not raw:
+        instance.previous_group_id = Post.objects.filter(
+            pk=instance.pk).values_list("group_id", flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versions.bump_post(instance.author_id, instance.group_id,
+                           getattr(instance, "previous_group_id", None))
+
+
+def comment_changed(comment):
+    post = Post.objects.filter(pk=comment.post_id).values_list(
+        "author_id", "group_id").first()
+    if post is not None:
+        versions.bump_post(*post)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        threads.place(instance)
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F("comment_count") + 1, updated=timezone.now())
+        comment_changed(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    threads.remove(instance)
+    Post.objects.filter(pk=instance.post_id, comment_count__gt=0).update(
+        comment_count=F("comment_count") - 1, updated=timezone.now())
+    comment_changed(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_user(instance.user_id, "following_count", 1)
+        bump_user(instance.author_id, "followers_count", 1)
+        timeline.promote(instance.author_id)
+        timeline.backfill(instance)
+        follow_graph.invalidate(instance.user_id, instance.author_id)
+        versions.bump("follows", versions.follows_scope(instance.user_id),
+                      versions.author_scope(instance.author_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    bump_user(instance.user_id, "following_count", -1)
+    bump_user(instance.author_id, "followers_count", -1)
+    timeline.prune(instance)
+    timeline.demote(instance.author_id)
+    follow_graph.invalidate(instance.user_id, instance.author_id)
+    versions.bump("follows", versions.follows_scope(instance.user_id),
+                  versions.author_scope(instance.author_id))
@@ -0,0 +1,115 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.leo = User.objects.create_user(username='leo')
+        self.anna = User.objects.create_user(username='anna')
+        self.group = Group.objects.create(title='Кошки', slug='cats',
+                                          description='Описание')
+        self.client = Client()
+
+    def add_posts(self, count, **fields):
+        return [Post.objects.create(text=f'Пост {i}', author=self.leo,
+                                    **fields) for i in range(count)]
+
+    def get(self, name, args=(), **params):
+        response = self.client.get(reverse(name, args=args), params)
+        return response.status_code, response.json()
+
+    def test_cursor_pages_cover_feed(self):
+        posts = self.add_posts(25, group=self.group)
+        seen, cursor = [], None
+        while True:
+            params = {'cursor': cursor} if cursor else {}
+            status, data = self.get('api_group_posts', ['cats'], **params)
+            self.assertEqual(status, 200)
+            seen += [post['id'] for post in data['results']]
+            cursor = data['next']
+            if not cursor:
+                break
+        self.assertEqual(seen, [post.pk for post in reversed(posts)])
+
+    def test_queries_do_not_grow_with_page(self):
+        def count(limit):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('api_posts'), {'limit': limit})
+            return len(queries)
+        self.add_posts(30, group=self.group)
+        self.assertEqual(count(2), count(30))
+
+    def test_sparse_fields(self):
+        post, = self.add_posts(1, group=self.group)
+        status, data = self.get('api_posts', fields='id,author,group')
+        self.assertEqual(data['results'],
+                         [{'id': post.pk, 'author': 'leo',
+                           'group': 'cats'}])
+        status, data = self.get('api_posts', fields='id,password')
+        self.assertEqual(status, 400)
+        self.assertIn('password', data['error'])
+
+    def test_multi_get_keeps_order(self):
+        first, second, third = self.add_posts(3)
+        status, data = self.get(
+            'api_posts', ids=f'{third.pk},{first.pk},999', fields='id')
+        self.assertEqual(data['results'], [{'id': third.pk},
+                                           {'id': first.pk}])
+        self.assertEqual(self.get('api_posts', ids='1,x')[0], 400)
+
+    def test_ids_are_bounded(self):
+        """id вне INTEGER базы и слишком длинный список - 400, а не 500"""
+        for ids in ('9' * 30, '0', ','.join(['1'] * 101)):
+            with self.subTest(ids=ids[:10]):
+                status, data = self.get('api_posts', ids=ids)
+                self.assertEqual(status, 400)
+                self.assertIn('ids', data['error'])
+
+    def test_etag_revalidation(self):
+        self.add_posts(1)
+        etag = self.client.get(reverse('api_posts'))['ETag']
+        response = self.client.get(reverse('api_posts'),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.post(reverse('api_posts')).status_code,
+                         405)
+
+    def test_post_comments_and_detail(self):
+        post, = self.add_posts(1)
+        root = Comment.objects.create(post=post, author=self.anna, text='А')
+        Comment.objects.create(post=post, author=self.leo, text='Б',
+                               parent=root)
+        status, data = self.get('api_post', [post.pk], fields='text')
+        self.assertEqual(data, {'text': 'Пост 0'})
+        status, data = self.get('api_post_comments', [post.pk],
+                                fields='author,parent,depth')
+        self.assertEqual(data['results'], [
+            {'author': 'leo', 'parent': root.pk, 'depth': 1},
+            {'author': 'anna', 'parent': None, 'depth': 0},
+        ])
+        self.assertEqual(self.get('api_post', [999])[0], 404)
+
+    def test_follows_and_follow_feed(self):
+        Follow.objects.create(user=self.anna, author=self.leo)
+        post, = self.add_posts(1)
+        status, data = self.get('api_followers', ['leo'],
+                                fields='user,author')
+        self.assertEqual(data['results'], [{'user': 'anna',
+                                            'author': 'leo'}])
+        self.assertEqual(self.get('api_follow_index')[0], 401)
+        self.client.force_login(self.anna)
+        status, data = self.get('api_follow_index', fields='id,author')
+        self.assertEqual(data['results'], [{'id': post.pk,
+                                            'author': 'leo'}])
+
+    def test_groups(self):
+        status, data = self.get('api_groups', fields='slug,title')
+        self.assertEqual(data['results'], [{'slug': 'cats',
+                                            'title': 'Кошки'}])
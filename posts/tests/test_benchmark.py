@@ -0,0 +1,56 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts.models import Comment, Follow, Post, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DatasetAndBenchmarkTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_generate_dataset(self):
+        call_command('generate_dataset', users=40, posts=200, comments=400,
+                     stdout=StringIO())
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 400)
+        self.assertTrue(Comment.objects.filter(depth__gt=0).exists())
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        # Степенной закон: у самого популярного автора подписчиков
+        # намного больше, чем у среднего
+        followers = sorted(
+            User.objects.values_list('stats__followers_count', flat=True),
+            reverse=True)
+        self.assertGreater(followers[0], 4 * followers[len(followers) // 2])
+        self.assertTrue(Follow.objects.exists())
+
+    def test_benchmark_writes_report(self):
+        call_command('generate_dataset', users=20, posts=50, comments=100,
+                     stdout=StringIO())
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'result.json')
+            call_command('benchmark', existing=True, repeat=2, output=output,
+                         stdout=StringIO())
+            with open(output, encoding='utf-8') as source:
+                report = json.load(source)
+        urls = report['tiers']['existing']
+        for name in ('index', 'profile', 'post', 'follow_index',
+                     'api_posts', 'comment_replies'):
+            self.assertIn(name, urls)
+        index = urls['index']
+        self.assertEqual(index['status'], 200)
+        self.assertGreater(index['rows'], 0)
+        self.assertGreater(index['queries'], 0)
+        self.assertLessEqual(index['p50_ms'], index['max_ms'])
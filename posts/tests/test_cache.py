@@ -0,0 +1,130 @@
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from posts import versions
+from posts.models import Comment, Group, Post, User
+
+
+class FeedVersionTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.group = Group.objects.create(title='Группа', slug='first',
+                                          description='Описание')
+        self.other = Group.objects.create(title='Другая', slug='second',
+                                          description='Описание')
+
+    def test_bump_changes_version(self):
+        """Сброс меняет версию только своей области"""
+        before = versions.get_versions('global', 'group:1')
+        versions.bump('global')
+        after = versions.get_versions('global', 'group:1')
+        self.assertNotEqual(before[0], after[0])
+        self.assertEqual(before[1], after[1])
+
+    def test_bump_waits_for_commit(self):
+        """Версия меняется только после фиксации транзакции: до неё
+        читатели видят старые строки и должны кэшировать их под старым
+        ключом"""
+        before = versions.get_versions('global')
+        with transaction.atomic():
+            Post.objects.create(text='Пост', author=self.user)
+            self.assertEqual(versions.get_versions('global'), before)
+        self.assertNotEqual(versions.get_versions('global'), before)
+
+    def test_new_post_visible_on_cached_index(self):
+        """Новый пост виден на главной сразу, без ожидания истечения кэша"""
+        Post.objects.create(text='Первый', author=self.user)
+        self.assertContains(self.client.get(reverse('index')), 'Первый')
+        Post.objects.create(text='Второй', author=self.user)
+        self.assertContains(self.client.get(reverse('index')), 'Второй')
+
+    def test_cached_index_is_reused(self):
+        """Без записей главная отдаётся из кэша фрагмента"""
+        post = Post.objects.create(text='Исходный', author=self.user)
+        self.client.get(reverse('index'))
+        Post.objects.filter(pk=post.pk).update(text='Обновлён в обход')
+        self.assertContains(self.client.get(reverse('index')), 'Исходный')
+
+    def test_comment_updates_cached_cards(self):
+        """Комментарий сбрасывает фрагменты лент с этим постом"""
+        post = Post.objects.create(text='Пост', author=self.user,
+                                   group=self.group)
+        urls = [reverse('index'), reverse('group', args=['first']),
+                reverse('profile', args=['writer'])]
+        for url in urls:
+            self.client.get(url)
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        for url in urls:
+            self.assertContains(self.client.get(url), 'Комментариев: 1')
+
+    def test_post_moved_to_other_group(self):
+        """Пост, перенесённый в другую группу, пропадает из прежней"""
+        post = Post.objects.create(text='Переезжает', author=self.user,
+                                   group=self.group)
+        self.assertContains(
+            self.client.get(reverse('group', args=['first'])), 'Переезжает')
+        post.group = self.other
+        post.save()
+        self.assertNotContains(
+            self.client.get(reverse('group', args=['first'])), 'Переезжает')
+
+
+class PostCardCacheTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='card_author')
+        self.reader = User.objects.create_user(username='card_reader')
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.post = Post.objects.create(text='Старая карточка',
+                                        author=self.author)
+        self.client.get(reverse('index'))
+        # Правка в обход сигналов и post.updated: карточка в кэше прежняя
+        Post.objects.filter(pk=self.post.pk).update(text='Обновлён в обход')
+
+    def test_new_post_reuses_other_cards(self):
+        """Новый пост сбрасывает ленту, но карточки остальных постов
+        берутся из кэша"""
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Новый пост')
+        self.assertContains(response, 'Старая карточка')
+
+    def test_comment_rerenders_card(self):
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Ответ')
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Обновлён в обход')
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_feed_fragment_shared_between_viewers(self):
+        """Анонимы и читатели без своих постов и подписок на странице
+        получают один и тот же фрагмент ленты"""
+        Client().get(reverse('index'))
+        key = make_template_fragment_key(
+            'index_page', [versions.scope_version('global'), None, '|'])
+        self.assertIsNotNone(cache.get(key))
+        cache.set(key, 'Общий фрагмент')
+        reader = Client()
+        reader.force_login(self.reader)
+        self.assertContains(reader.get(reverse('index')), 'Общий фрагмент')
+        # У автора поста своя сводка отметок и свой фрагмент
+        self.assertNotContains(self.client.get(reverse('index')),
+                               'Общий фрагмент')
+
+    def test_viewer_dependent_parts(self):
+        """Кнопка правки видна только автору, хотя карточка в кэше"""
+        edit = reverse('post_edit', args=['card_author', self.post.pk])
+        self.assertContains(self.client.get(reverse('index')), edit)
+        reader = Client()
+        reader.force_login(self.reader)
+        self.assertNotContains(reader.get(reverse('index')), edit)
+        self.assertNotContains(Client().get(reverse('index')), edit)
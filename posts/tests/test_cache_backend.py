@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from yatube.cache import SQLiteCache
+
+
+def increment(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+
+    def test_tests_use_separate_cache_file(self):
+        """cache.clear() в тестах не стирает кэш проекта"""
+        self.assertNotEqual(settings.CACHES['default']['LOCATION'],
+                            os.path.join(settings.BASE_DIR, 'cache.sqlite3'))
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        cache = self.cache
+        cache.set('a', {'x': 1})
+        self.assertEqual(cache.get('a'), {'x': 1})
+        self.assertFalse(cache.add('a', 2))
+        self.assertTrue(cache.add('b', 2))
+        self.assertEqual(cache.get_many(['a', 'b', 'c']),
+                         {'a': {'x': 1}, 'b': 2})
+        cache.delete_many(['a', 'b'])
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('a', 'default'), 'default')
+
+    def test_expiry(self):
+        self.cache.set('short', 1, timeout=0.05)
+        self.cache.set('forever', 1, timeout=None)
+        time.sleep(0.1)
+        self.assertFalse(self.cache.has_key('short'))
+        self.assertTrue(self.cache.add('short', 2))
+        self.assertEqual(self.cache.get('forever'), 1)
+
+    def test_shared_between_instances(self):
+        """Другой экземпляр (как в другом процессе) видит те же данные"""
+        self.cache.set('shared', 'value')
+        self.assertEqual(self.make_cache().get('shared'), 'value')
+        self.make_cache().delete('shared')
+        self.assertIsNone(self.cache.get('shared'))
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=increment, args=(self.path, 50))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_lru_eviction_by_entries(self):
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        cache.set('hot', 0)
+        for i in range(30):
+            cache.set(f'key{i}', i)
+            # "hot" всё время читается и не должна вытесняться
+            cache._db.execute("UPDATE cache SET accessed = ? WHERE key = ?",
+                              (time.time() + 1000, cache.make_key('hot')))
+        entries = cache._db.execute(
+            "SELECT COUNT(*) FROM cache").fetchone()[0]
+        self.assertLessEqual(entries, 10)
+        self.assertEqual(cache.get('hot'), 0)
+
+    def test_size_cap(self):
+        cache = self.make_cache(MAX_SIZE=50000)
+        for i in range(20):
+            cache.set(f'blob{i}', b'x' * 10000)
+        stored = cache._db.execute(
+            "SELECT SUM(size) FROM cache").fetchone()[0]
+        totals = cache._db.execute(
+            "SELECT bytes FROM cache_totals").fetchone()[0]
+        self.assertLessEqual(stored, 50000)
+        self.assertEqual(stored, totals)
+        self.assertIsNotNone(cache.get('blob19'))
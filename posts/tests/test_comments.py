@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+from posts.pagination import COMMENTS_PER_PAGE
+
+
+class CommentPaginationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='leo')
+        self.post = Post.objects.create(text='Пост', author=self.author)
+        self.readers = [User.objects.create_user(username=f'reader{i}')
+                        for i in range(3)]
+        self.client = Client()
+
+    def add_comments(self, count):
+        for i in range(count):
+            Comment.objects.create(post=self.post, author=self.readers[i % 3],
+                                   text=f'Комментарий {i}')
+
+    def post_queries(self):
+        cache.clear()
+        url = reverse('post', args=['leo', self.post.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, len(queries)
+
+    def test_post_page_cost_does_not_grow_with_thread(self):
+        self.add_comments(5)
+        _, few = self.post_queries()
+        self.add_comments(COMMENTS_PER_PAGE * 3)
+        response, many = self.post_queries()
+        self.assertEqual(few, many)
+        self.assertEqual(len(response.context['thread']),
+                         COMMENTS_PER_PAGE)
+        self.assertContains(response, 'Показать ещё комментарии')
+
+    def test_fragment_pages_through_all_comments(self):
+        self.add_comments(COMMENTS_PER_PAGE * 2 + 5)
+        response, _ = self.post_queries()
+        seen = [comment.pk for comment in response.context['thread']]
+        cursor = response.context['comments_cursor']
+        url = reverse('post_comments', args=['leo', self.post.pk])
+        while cursor:
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertNotContains(response, '<html')
+            seen += [comment.pk for comment in response.context['thread']]
+            cursor = response.context['comments_cursor']
+        expected = list(Comment.objects.filter(post=self.post)
+                        .order_by('-created', '-pk')
+                        .values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_short_thread_has_no_more_link(self):
+        self.add_comments(3)
+        response, _ = self.post_queries()
+        self.assertIsNone(response.context['comments_cursor'])
+        self.assertNotContains(response, 'Показать ещё комментарии')
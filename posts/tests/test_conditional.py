@@ -0,0 +1,107 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+
+class ConditionalGetTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        self.post = Post.objects.create(text='Пост', author=self.user,
+                                        group=self.group)
+        self.client = Client()
+        self.urls = [
+            reverse('index'),
+            reverse('group', args=['group']),
+            reverse('profile', args=['writer']),
+            reverse('post', args=['writer', self.post.pk]),
+        ]
+
+    def revalidate(self, url):
+        etag = self.client.get(url)['ETag']
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_return_304(self):
+        """Повторный запрос с тем же ETag получает 304 без рендеринга"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+
+    def test_writes_change_validators(self):
+        """После нового комментария страницы отдаются заново"""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        Comment.objects.create(post=self.post, author=self.user, text='Ок')
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_validators_depend_on_viewer(self):
+        """ETag зависит от пользователя: у него другая шапка страницы"""
+        anonymous = self.client.get(self.urls[0])['ETag']
+        self.client.force_login(self.user)
+        self.assertNotEqual(self.client.get(self.urls[0])['ETag'], anonymous)
+
+    def test_missing_pages_still_404(self):
+        response = self.client.get(reverse('group', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+
+class LastModifiedTests(TransactionTestCase):
+    """Запросы только с If-Modified-Since, часы под управлением теста"""
+
+    def setUp(self):
+        cache.clear()
+        self.now = time.time()
+        clock = mock.patch('time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.user = User.objects.create_user(username='writer')
+        self.post = Post.objects.create(text='Пост', author=self.user)
+        self.client = Client()
+        self.urls = [reverse('index'),
+                     reverse('profile', args=['writer']),
+                     reverse('post', args=['writer', self.post.pk])]
+
+    def modified(self):
+        self.now += 2
+        return {url: self.client.get(url)['Last-Modified']
+                for url in self.urls}
+
+    def assertStatus(self, modified, status):
+        for url, date in modified.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=date)
+                self.assertEqual(response.status_code, status)
+
+    def test_unchanged_pages_return_304(self):
+        self.assertStatus(self.modified(), 304)
+
+    def test_edit_changes_last_modified(self):
+        modified = self.modified()
+        self.post.text = 'Исправлен'
+        self.post.save()
+        self.now += 2
+        self.assertStatus(modified, 200)
+
+    def test_delete_changes_last_modified(self):
+        modified = self.modified()
+        del modified[self.urls[2]]
+        self.post.delete()
+        self.now += 2
+        self.assertStatus(modified, 200)
+
+    def test_no_last_modified_right_after_write(self):
+        """Запись в ту же секунду дала бы ту же дату и 304 со старой
+        страницей, поэтому заголовка нет"""
+        self.assertNotIn('Last-Modified', self.client.get(self.urls[0]))
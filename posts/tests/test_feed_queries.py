@@ -0,0 +1,55 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+
+class FeedQueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='feed',
+                                         description='Описание')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def add_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(text=f'Пост {i}', author=self.user,
+                                       group=self.group)
+            Comment.objects.create(post=post, author=self.user,
+                                   text='Комментарий')
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_feed_queries_do_not_grow_with_page_size(self):
+        """Число запросов ленты не зависит от количества постов
+        на странице"""
+        urls = [reverse('index'),
+                reverse('group', args=[self.group.slug]),
+                reverse('profile', args=[self.user.username])]
+        self.add_posts(1)
+        single = [self.count_queries(url) for url in urls]
+        self.add_posts(9)
+        full = [self.count_queries(url) for url in urls]
+        self.assertEqual(single, full)
+
+    def test_comment_count_annotation(self):
+        """Карточка показывает число комментариев из аннотации"""
+        self.add_posts(1)
+        post = Post.objects.for_feed().get()
+        self.assertEqual(post.comment_count, 1)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Комментариев: 1')
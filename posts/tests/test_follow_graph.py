@@ -0,0 +1,59 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from posts.follow_graph import follow_graph
+from posts.models import Follow, Post, User
+
+
+class FollowGraphTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_lookups_are_cached(self):
+        """Повторные проверки подписки не ходят в базу"""
+        self.assertTrue(follow_graph.is_following(self.reader, self.author))
+        follow_graph.followers(self.author.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                follow_graph.is_following_many(
+                    self.reader, [self.author, self.other]),
+                {self.author.pk: True, self.other.pk: False})
+            self.assertEqual(follow_graph.followers(self.author.pk),
+                             {self.reader.pk})
+
+    def test_follow_views_invalidate_graph(self):
+        """Подписка и отписка через страницы сразу видны в графе"""
+        client = Client()
+        client.force_login(self.reader)
+        self.assertFalse(follow_graph.is_following(self.reader, self.other))
+        client.get(reverse('profile_follow', args=[self.other.username]))
+        self.assertTrue(follow_graph.is_following(self.reader, self.other))
+        client.get(reverse('profile_unfollow', args=[self.other.username]))
+        self.assertFalse(follow_graph.is_following(self.reader, self.other))
+
+    def test_invalidation_waits_for_commit(self):
+        """Кэш сбрасывается после фиксации: иначе параллельное чтение
+        закэшировало бы подписки без новой строки"""
+        key = f'follow_graph:following:{self.reader.pk}'
+        follow_graph.following(self.reader.pk)
+        with transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.other)
+            self.assertIsNotNone(cache.get(key))
+        self.assertIsNone(cache.get(key))
+        self.assertTrue(follow_graph.is_following(self.reader, self.other))
+
+    def test_feed_cards_show_follow_state(self):
+        """Карточки постов в ленте показывают подписку читателя"""
+        Post.objects.create(text='Пост', author=self.author)
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('index'))
+        self.assertTrue(response.context['page'][0].author_followed)
+        self.assertContains(response, 'Вы подписаны')
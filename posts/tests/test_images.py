@@ -0,0 +1,82 @@
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from posts.forms import PostForm
+
+
+def upload(size, fmt='JPEG', mode='RGB', name='photo.jpg', **save):
+    buffer = BytesIO()
+    Image.new(mode, size, 'red').save(buffer, fmt, **save)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(IMAGE_MAX_SIDE=500, IMAGE_FORMAT='JPEG')
+class ImageIngestTests(SimpleTestCase):
+
+    def clean(self, image):
+        form = PostForm(data={'text': 'Текст'}, files={'image': image})
+        return form.is_valid(), form
+
+    def stored(self, form):
+        image = form.cleaned_data['image']
+        return image, Image.open(BytesIO(image.read()))
+
+    def test_large_jpeg_is_downscaled_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'  # Make
+        valid, form = self.clean(upload((4000, 3000), exif=exif.tobytes()))
+        self.assertTrue(valid, form.errors)
+        image, decoded = self.stored(form)
+        self.assertEqual(decoded.format, 'JPEG')
+        self.assertEqual(decoded.size, (500, 375))
+        self.assertNotIn('exif', decoded.info)
+        self.assertTrue(image.name.endswith('.jpg'))
+
+    def test_transparent_png_stays_png(self):
+        valid, form = self.clean(upload((800, 800), 'PNG', 'RGBA',
+                                        name='logo.png'))
+        self.assertTrue(valid, form.errors)
+        image, decoded = self.stored(form)
+        self.assertEqual((decoded.format, decoded.mode), ('PNG', 'RGBA'))
+        self.assertEqual(decoded.size, (500, 500))
+
+    def test_opaque_png_is_reencoded(self):
+        valid, form = self.clean(upload((300, 200), 'PNG', name='pic.png'))
+        self.assertTrue(valid, form.errors)
+        image, decoded = self.stored(form)
+        self.assertEqual(decoded.format, 'JPEG')
+        self.assertEqual(decoded.size, (300, 200))
+        self.assertEqual(image.name, 'pic.jpg')
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=1000)
+    def test_byte_limit(self):
+        valid, form = self.clean(upload((1000, 1000), 'BMP', name='a.bmp'))
+        self.assertFalse(valid)
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'file_too_large')
+
+    @override_settings(IMAGE_MAX_PIXELS=400000,
+                       IMAGE_MAX_FULL_PIXELS=400000)
+    def test_pixel_limit_counts_reduced_decoding(self):
+        """Для JPEG считаются пиксели после уменьшенного декодирования
+        (2400 -> 600), для PNG - полный размер"""
+        valid, form = self.clean(upload((2400, 2400)))
+        self.assertTrue(valid, form.errors)
+        valid, form = self.clean(upload((700, 700), 'PNG', name='a.png'))
+        self.assertFalse(valid)
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
+    @override_settings(IMAGE_MAX_PIXELS=4000000, IMAGE_MAX_FULL_PIXELS=400000)
+    def test_full_decoding_formats_have_stricter_limit(self):
+        """PNG того же размера, что и принятый JPEG, декодировался бы
+        целиком и отклоняется"""
+        valid, form = self.clean(upload((1000, 1000)))
+        self.assertTrue(valid, form.errors)
+        valid, form = self.clean(upload((1000, 1000), 'PNG', name='a.png'))
+        self.assertFalse(valid)
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
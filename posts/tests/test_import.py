@@ -0,0 +1,158 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import (Comment, Follow, Group, Post, ThumbnailJob,
+                          TimelineEntry, User, UserStats)
+
+
+class ImportContentTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.dir = tempfile.TemporaryDirectory()
+        # Уже существующий пользователь сопоставляется по username
+        self.leo = User.objects.create_user(username='leo')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write_jsonl(self, name, rows):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'w', encoding='utf-8') as target:
+            for row in rows:
+                target.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return path
+
+    def write_csv(self, name, text):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'w', encoding='utf-8') as target:
+            target.write(text)
+        return path
+
+    def test_import_maps_ids_and_rebuilds_derived_data(self):
+        files = [
+            self.write_jsonl('posts.jsonl', [
+                {'id': 10, 'author': 1, 'group': 5, 'text': 'Первый',
+                 'pub_date': '2020-01-01T10:00:00'},
+                {'id': 11, 'author': 2, 'text': 'Второй'},
+                {'id': 12, 'author': 99, 'text': 'Без автора'},
+            ]),
+            self.write_jsonl('users.jsonl', [
+                {'id': 1, 'username': 'leo'},
+                {'id': 2, 'username': 'anna', 'first_name': 'Анна'},
+            ]),
+            self.write_csv('groups.csv',
+                           'id,slug,title,description\n5,cats,Кошки,\n'),
+            self.write_jsonl('comments.jsonl', [
+                {'id': 1, 'post': 10, 'author': 2, 'text': 'Корень'},
+                {'id': 2, 'post': 10, 'author': 1, 'parent': 1,
+                 'text': 'Ответ'},
+            ]),
+            self.write_jsonl('follows.jsonl', [{'user': 2, 'author': 1}]),
+        ]
+        out = StringIO()
+        call_command('import_content', *files, batch_size=1, stdout=out)
+        self.assertIn('строк/с', out.getvalue())
+        self.assertIn('пропущено 1', out.getvalue())
+
+        anna = User.objects.get(username='anna')
+        self.assertEqual(User.objects.count(), 2)
+        first = Post.objects.get(text='Первый')
+        self.assertEqual(first.author, self.leo)
+        self.assertEqual(first.group, Group.objects.get(slug='cats'))
+        self.assertEqual(first.pub_date.year, 2020)
+        self.assertEqual(first.comment_count, 2)
+        root = Comment.objects.get(text='Корень')
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual((reply.parent_id, reply.depth), (root.pk, 1))
+        self.assertEqual(root.reply_count, 1)
+        self.assertTrue(Follow.objects.filter(user=anna,
+                                              author=self.leo).exists())
+        self.assertEqual(UserStats.objects.get(user=self.leo).followers_count,
+                         1)
+        self.assertTrue(TimelineEntry.objects.filter(user=anna,
+                                                     post=first).exists())
+        # После импорта обычные save() получают свободные id
+        Post.objects.create(text='Новый', author=anna)
+
+    def test_reply_before_parent_is_skipped(self):
+        """Ответ, чей родитель идёт в файле позже, не становится корневым"""
+        files = [
+            self.write_jsonl('posts.jsonl', [
+                {'id': 1, 'author': 1, 'text': 'Пост'}]),
+            self.write_jsonl('users.jsonl', [{'id': 1, 'username': 'leo'}]),
+            self.write_jsonl('comments.jsonl', [
+                {'id': 2, 'post': 1, 'author': 1, 'parent': 1,
+                 'text': 'Ответ'},
+                {'id': 1, 'post': 1, 'author': 1, 'text': 'Корень'},
+            ]),
+        ]
+        out = StringIO()
+        call_command('import_content', *files, stdout=out)
+        self.assertIn('comments: 2 строк', out.getvalue())
+        self.assertIn('пропущено 1', out.getvalue())
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)), ['Корень'])
+
+    def test_imported_images_are_enqueued(self):
+        """Превью импортированных картинок готовит обработчик, а не первая
+        страница ленты"""
+        files = [
+            self.write_jsonl('posts.jsonl', [
+                {'id': 1, 'author': 1, 'text': 'С картинкой',
+                 'image': 'posts/pic.jpg'},
+                {'id': 2, 'author': 1, 'text': 'Без картинки'},
+            ]),
+            self.write_jsonl('users.jsonl', [{'id': 1, 'username': 'leo'}]),
+        ]
+        call_command('import_content', *files, stdout=StringIO())
+        self.assertEqual(
+            list(ThumbnailJob.objects.values_list('post__text', flat=True)),
+            ['С картинкой'])
+
+    def test_unknown_file_name(self):
+        path = self.write_jsonl('likes.jsonl', [])
+        with self.assertRaisesMessage(Exception, 'likes.jsonl'):
+            call_command('import_content', path, stdout=StringIO())
+
+    def test_duplicates_in_file_map_to_first_row(self):
+        """Повтор username или slug в файле не роняет импорт: ссылки на
+        повтор ведут на первую строку"""
+        files = [
+            self.write_jsonl('users.jsonl', [
+                {'id': 1, 'username': 'anna'},
+                {'id': 2, 'username': 'anna'},
+            ]),
+            self.write_jsonl('groups.jsonl', [
+                {'id': 1, 'slug': 'cats', 'title': 'Кошки'},
+                {'id': 2, 'slug': 'cats', 'title': 'Ещё кошки'},
+            ]),
+            self.write_jsonl('posts.jsonl', [
+                {'id': 1, 'author': 2, 'group': 2, 'text': 'Пост'}]),
+        ]
+        call_command('import_content', *files, stdout=StringIO())
+        post = Post.objects.get()
+        self.assertEqual(post.author.username, 'anna')
+        self.assertEqual(post.group.title, 'Кошки')
+        self.assertEqual(User.objects.filter(username='anna').count(), 1)
+
+    def test_import_keeps_auto_now_add(self):
+        """Даты из файла не меняют поля моделей для остального процесса"""
+        files = [
+            self.write_jsonl('users.jsonl', [{'id': 1, 'username': 'leo'}]),
+            self.write_jsonl('posts.jsonl', [
+                {'id': 1, 'author': 1, 'text': 'Старый',
+                 'pub_date': '2020-01-01T10:00:00'}]),
+        ]
+        call_command('import_content', *files, stdout=StringIO())
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+        old = Post.objects.get(text='Старый')
+        self.assertEqual(old.pub_date.year, 2020)
+        new = Post.objects.create(text='Новый', author=self.leo)
+        self.assertIsNotNone(new.pub_date)
@@ -0,0 +1,22 @@
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+
+from posts.models import Follow, User
+
+
+class FollowModelTests(TestCase):
+
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader')
+        self.authors = [User.objects.create_user(username=f'author{i}')
+                        for i in range(3)]
+
+    def test_user_can_follow_many_authors(self):
+        for author in self.authors:
+            Follow.objects.create(user=self.reader, author=author)
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 3)
+
+    def test_follow_is_unique_per_author(self):
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.authors[0])
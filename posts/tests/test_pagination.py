@@ -0,0 +1,158 @@
+import base64
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts.models import Follow, Post, User
+from posts.pagination import CountCachedPaginator
+
+
+class CursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cursor_user')
+        for i in range(25):
+            Post.objects.create(text=f'Пост {i}', author=cls.user)
+        # Часть постов с одинаковой датой, чтобы проверить сортировку по id
+        first = Post.objects.order_by('pk').first()
+        Post.objects.filter(pk__lte=first.pk + 5).update(
+            pub_date=first.pub_date)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def walk(self, url, attr):
+        """Проходит ленту по курсорам и собирает id постов по страницам"""
+        pages = []
+        response = self.client.get(url)
+        while True:
+            page = response.context['page']
+            pages.append([post.pk for post in page])
+            cursor = getattr(page, attr)
+            if cursor is None:
+                return pages, page
+            response = self.client.get(url, {'cursor': cursor})
+
+    def test_next_pages_cover_feed(self):
+        """Переход по next_cursor выдаёт все посты ровно один раз
+        в порядке ленты"""
+        pages, last = self.walk(reverse('profile', args=[self.user]),
+                                'next_cursor')
+        expected = list(Post.objects.order_by('-pub_date', '-pk')
+                        .values_list('pk', flat=True))
+        self.assertEqual([len(ids) for ids in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), expected)
+        self.assertIsNotNone(last.previous_cursor)
+
+    def test_previous_cursor_returns_same_page(self):
+        """previous_cursor возвращает ровно предыдущую страницу"""
+        url = reverse('index')
+        first = self.client.get(url).context['page']
+        second = self.client.get(
+            url, {'cursor': first.next_cursor}).context['page']
+        back = self.client.get(
+            url, {'cursor': second.previous_cursor}).context['page']
+        self.assertEqual([p.pk for p in back], [p.pk for p in first])
+        self.assertIsNone(back.previous_cursor)
+        self.assertIsNotNone(back.next_cursor)
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор открывает первую страницу, а не 500"""
+        response = self.client.get(reverse('index'), {'cursor': '!!!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['page'].cursor)
+        self.assertEqual(len(response.context['page']), 10)
+
+    def test_out_of_range_pk_in_cursor_shows_first_page(self):
+        """id, который не помещается в INTEGER базы, - испорченный курсор"""
+        for pk in ('9' * 30, '0', '-1'):
+            raw = f'n|2020-01-01T00:00:00|{pk}'.encode()
+            token = base64.urlsafe_b64encode(raw).decode().rstrip('=')
+            with self.subTest(pk=pk):
+                response = self.client.get(reverse('index'),
+                                           {'cursor': token})
+                self.assertEqual(response.status_code, 200)
+                self.assertIsNone(response.context['page'].cursor)
+
+    def test_impossible_date_in_cursor_shows_first_page(self):
+        """Курсор правильного формата с несуществующей датой"""
+        # base64 от 'n|2020-13-01T00:00:00|1'
+        token = 'bnwyMDIwLTEzLTAxVDAwOjAwOjAwfDE'
+        response = self.client.get(reverse('index'), {'cursor': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['page'].cursor)
+
+
+class CountCachedPaginatorTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        for i in range(30):
+            Post.objects.create(text=f'Пост {i}', author=self.user)
+
+    def paginator(self, queryset=None):
+        return CountCachedPaginator(
+            queryset if queryset is not None else Post.objects.all(), 10,
+            scopes=('global',))
+
+    def test_count_is_cached_until_feed_changes(self):
+        self.assertEqual(self.paginator().count, 30)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.paginator().count, 30)
+        Post.objects.create(text='Ещё пост', author=self.user)
+        self.assertEqual(self.paginator().count, 31)
+
+    def test_filtered_counts_are_cached_separately(self):
+        filtered = Post.objects.filter(text__startswith='Пост 1')
+        self.assertEqual(self.paginator(filtered).count, 11)
+        self.assertEqual(self.paginator().count, 30)
+
+    def test_large_table_is_estimated(self):
+        top = Post.objects.order_by('-pk').values_list('pk', flat=True)[0]
+        with mock.patch('posts.pagination.ESTIMATE_ABOVE', 10):
+            paginator = self.paginator()
+            with self.assertNumQueries(1):
+                self.assertEqual(paginator.count, top)
+            self.assertTrue(paginator.estimated)
+            # С фильтром оценка по MAX(id) не годится
+            filtered = self.paginator(Post.objects.filter(author=self.user))
+            self.assertEqual(filtered.count, 30)
+            self.assertFalse(filtered.estimated)
+
+    def test_admin_changelist(self):
+        client = Client()
+        client.force_login(self.user)
+        url = reverse('admin:posts_post_changelist')
+        response = client.get(url)
+        self.assertIsInstance(response.context['cl'].paginator,
+                              CountCachedPaginator)
+        with self.assertNumQueries(3):
+            # Сессия, пользователь и строки страницы; COUNT(*) - из кэша
+            client.get(url)
+
+    def test_admin_marks_estimated_count(self):
+        client = Client()
+        client.force_login(self.user)
+        url = reverse('admin:posts_post_changelist')
+        self.assertNotContains(client.get(url), 'около')
+        cache.clear()
+        with mock.patch('posts.pagination.ESTIMATE_ABOVE', 10):
+            self.assertContains(client.get(url), 'около')
+
+    def test_follow_count_is_reset_by_follows(self):
+        client = Client()
+        client.force_login(self.user)
+        url = reverse('admin:posts_follow_changelist')
+        self.assertEqual(client.get(url).context['cl'].result_count, 0)
+        author = User.objects.create_user(username='leo')
+        follow = Follow.objects.create(user=self.user, author=author)
+        self.assertEqual(client.get(url).context['cl'].result_count, 1)
+        follow.delete()
+        self.assertEqual(client.get(url).context['cl'].result_count, 0)
+
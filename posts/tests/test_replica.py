@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import tempfile
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from posts import versions
+from posts.api import api_view
+from posts.models import Post
+from yatube import replica
+
+router = replica.PrimaryReplicaRouter()
+
+
+@replica.reads_from_replica
+def feed(request):
+    return HttpResponse(router.db_for_read(Post))
+
+
+def write(request):
+    return HttpResponse(router.db_for_write(Post))
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    REPLICA_MAX_LAG=30)
+@mock.patch('yatube.replica.enabled', return_value=True)
+class ReplicaRoutingTests(SimpleTestCase):
+    # versions.bump() спрашивает у соединения, открыта ли транзакция
+    databases = {'default'}
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def call(self, view, request=None):
+        middleware = replica.ReplicaMiddleware(view)
+        return middleware(request or self.factory.get('/'))
+
+    def test_feed_reads_from_fresh_replica(self, enabled):
+        cache.set(replica.SNAPSHOT_KEY, time.time() - 2)
+        response = self.call(feed)
+        self.assertEqual(response.content, b'replica')
+        self.assertAlmostEqual(float(response['X-Replica-Lag']), 2,
+                               delta=1)
+        self.assertNotIn(replica.PIN_COOKIE, response.cookies)
+
+    def test_other_views_read_from_primary(self, enabled):
+        cache.set(replica.SNAPSHOT_KEY, time.time())
+        response = self.call(
+            lambda request: HttpResponse(router.db_for_read(Post)))
+        self.assertEqual(response.content, b'default')
+        self.assertFalse(response.has_header('X-Replica-Lag'))
+
+    def test_stale_or_unknown_replica_is_skipped(self, enabled):
+        self.assertEqual(self.call(feed).content, b'default')
+        cache.set(replica.SNAPSHOT_KEY, time.time() - 60)
+        self.assertEqual(self.call(feed).content, b'default')
+
+    def test_write_pins_reader_to_primary(self, enabled):
+        cache.set(replica.SNAPSHOT_KEY, time.time())
+        response = self.call(write)
+        self.assertEqual(response.content, b'default')
+        pin = response.cookies[replica.PIN_COOKIE]
+        # Привязка не короче допустимого отставания реплики
+        self.assertEqual(pin['max-age'], 30)
+        request = self.factory.get('/')
+        request.COOKIES[replica.PIN_COOKIE] = pin.value
+        self.assertEqual(self.call(feed, request).content, b'default')
+        # Срок прошёл - снова реплика
+        request.COOKIES[replica.PIN_COOKIE] = str(time.time() - 1)
+        self.assertEqual(self.call(feed, request).content, b'replica')
+
+    def test_feed_changed_after_snapshot_reads_primary(self, enabled):
+        cache.set(replica.SNAPSHOT_KEY, time.time() - 1)
+
+        @replica.reads_from_replica
+        def versioned(request):
+            before = router.db_for_read(Post)
+            versions.bump('global')
+            versions.get_versions('global')
+            return HttpResponse(f'{before} {router.db_for_read(Post)}')
+        self.assertEqual(self.call(versioned).content, b'replica default')
+
+    def test_api_etag_is_computed_on_replica(self, enabled):
+        """ETag API считается внутри api_view, как и само чтение"""
+        cache.set(replica.SNAPSHOT_KEY, time.time())
+        view = api_view(lambda request: {},
+                        etag_func=lambda request: router.db_for_read(Post))
+        self.assertEqual(self.call(view)['ETag'], '"replica"')
+
+    def test_migrations_only_on_primary(self, enabled):
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+        self.assertFalse(router.allow_migrate(replica.REPLICA, 'posts'))
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ReplicaRefreshTests(SimpleTestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.dir.name, 'db.sqlite3')
+        self.target = os.path.join(self.dir.name, 'replica.sqlite3')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def connect(self, path):
+        db = sqlite3.connect(path, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+        return db
+
+    def test_refresh_while_replica_is_read(self):
+        primary = self.connect(self.source)
+        primary.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        primary.execute('INSERT INTO item VALUES (1)')
+        replica.refresh(self.source, self.target)
+        reader = self.connect(self.target)
+        reader.execute('BEGIN')
+        self.assertEqual(
+            reader.execute('SELECT count(*) FROM item').fetchone(), (1,))
+        primary.execute('INSERT INTO item VALUES (2)')
+        replica.refresh(self.source, self.target)
+        # Открытая транзакция читателя не мешает обновлению и видит
+        # старый снимок
+        self.assertEqual(
+            reader.execute('SELECT count(*) FROM item').fetchone(), (1,))
+        reader.execute('COMMIT')
+        self.assertEqual(
+            reader.execute('SELECT count(*) FROM item').fetchone(), (2,))
+        self.assertLess(replica.replica_lag(), 5)
@@ -0,0 +1,105 @@
+import base64
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Group, Post, User
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.leo = User.objects.create_user(username='leo')
+        self.anna = User.objects.create_user(username='anna')
+        self.group = Group.objects.create(title='Кошки', slug='cats',
+                                          description='Описание')
+        self.client = Client()
+
+    def ids(self, query, **filters):
+        return search.search(query, **filters)[0]
+
+    def test_index_follows_save_and_delete(self):
+        """Индекс обновляется при создании, изменении и удалении поста"""
+        post = Post.objects.create(text='Рыжий кот спит', author=self.leo)
+        self.assertEqual(self.ids('кот'), [post.pk])
+        post.text = 'Рыжая собака спит'
+        post.save()
+        self.assertEqual(self.ids('кот'), [])
+        self.assertEqual(self.ids('собака'), [post.pk])
+        post.delete()
+        self.assertEqual(self.ids('собака'), [])
+
+    def test_ranking_prefix_and_syntax(self):
+        """Результаты ранжируются, последнее слово ищется как префикс,
+        а спецсимволы FTS5 в запросе не ломают поиск"""
+        weak = Post.objects.create(text='кот и много других слов про погоду',
+                                   author=self.leo)
+        strong = Post.objects.create(text='кот кот котик', author=self.leo)
+        self.assertEqual(self.ids('кот'), [strong.pk, weak.pk])
+        self.assertEqual(self.ids('пого'), [weak.pk])
+        self.assertEqual(self.ids('кот")(*:'), [strong.pk, weak.pk])
+        self.assertEqual(self.ids('!!!'), [])
+
+    def test_facets_and_filters(self):
+        Post.objects.create(text='кот', author=self.leo, group=self.group)
+        Post.objects.create(text='кот', author=self.leo)
+        anna_post = Post.objects.create(text='кот', author=self.anna)
+        facets = search.facets('кот')
+        self.assertEqual(facets['author'], [(self.leo.pk, 2),
+                                            (self.anna.pk, 1)])
+        self.assertEqual(facets['group'], [(self.group.pk, 1)])
+        self.assertEqual(self.ids('кот', author_id=self.anna.pk),
+                         [anna_post.pk])
+        self.assertEqual(len(self.ids('кот', group_id=self.group.pk)), 1)
+
+    def test_search_view_pages_by_cursor(self):
+        for i in range(15):
+            Post.objects.create(text=f'кот номер {i}', author=self.leo)
+        response = self.client.get(reverse('search'), {'q': 'кот'})
+        first = [post.pk for post in response.context['page']]
+        self.assertEqual(len(first), 10)
+        self.assertContains(response, '@leo</a> (15)')
+        response = self.client.get(
+            reverse('search') + '?' + response.context['next_query'])
+        second = [post.pk for post in response.context['page']]
+        self.assertEqual(len(second), 5)
+        self.assertFalse(set(first) & set(second))
+        self.assertIsNone(response.context['next_query'])
+
+    def test_first_page_link_keeps_filters(self):
+        """«В начало» сбрасывает только курсор, фильтры остаются"""
+        for i in range(15):
+            Post.objects.create(text=f'кот {i}', author=self.leo,
+                                group=self.group)
+        params = {'q': 'кот', 'group': self.group.pk}
+        response = self.client.get(reverse('search'), params)
+        response = self.client.get(
+            reverse('search') + '?' + response.context['next_query'])
+        self.assertEqual(response.context['first_query'],
+                         f'q=%D0%BA%D0%BE%D1%82&group={self.group.pk}')
+        self.assertEqual(response.context['reset_query'],
+                         'q=%D0%BA%D0%BE%D1%82')
+
+    def test_broken_cursor_shows_first_page(self):
+        """Ранг nan/inf и id вне INTEGER базы - испорченный курсор"""
+        post = Post.objects.create(text='кот', author=self.leo)
+        for raw in ('1.0|' + '9' * 30, 'nan|1', 'inf|1', '-inf|1'):
+            token = base64.urlsafe_b64encode(raw.encode()).decode()
+            with self.subTest(cursor=raw):
+                response = self.client.get(reverse('search'),
+                                           {'q': 'кот', 'cursor': token})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    [item.pk for item in response.context['page']],
+                    [post.pk])
+
+    def test_admin_search_uses_index(self):
+        Post.objects.create(text='найди меня', author=self.leo)
+        Post.objects.create(text='другой текст', author=self.leo)
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/posts/post/', {'q': 'найди'})
+        self.assertEqual(response.context['cl'].result_count, 1)
@@ -0,0 +1,100 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from yatube.backends.sqlite3.base import DatabaseWrapper
+
+
+class SQLiteBackendTests(SimpleTestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'db.sqlite3')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def connect(self, **pragmas):
+        wrapper = DatabaseWrapper({'NAME': self.path,
+                                   'OPTIONS': {'pragmas': pragmas}})
+        conn = wrapper.get_new_connection(wrapper.get_connection_params())
+        # Транзакции открываются явно
+        conn.isolation_level = None
+        return conn
+
+    def test_pragmas_on_connect(self):
+        conn = self.connect(cache_size=-1000)
+        pragma = (lambda name: conn.execute(f'PRAGMA {name}').fetchone()[0])
+        self.assertEqual(pragma('journal_mode'), 'wal')
+        # NORMAL
+        self.assertEqual(pragma('synchronous'), 1)
+        self.assertEqual(pragma('busy_timeout'), 5000)
+        self.assertEqual(pragma('cache_size'), -1000)
+        self.assertEqual(pragma('mmap_size'), 256 * 2 ** 20)
+
+    def test_writer_commits_while_readers_are_open(self):
+        writer = self.connect(busy_timeout=100)
+        writer.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        writer.execute('INSERT INTO item VALUES (1)')
+        readers = [self.connect(busy_timeout=100) for _ in range(3)]
+        for reader in readers:
+            reader.execute('BEGIN')
+            self.assertEqual(
+                reader.execute('SELECT count(*) FROM item').fetchone(), (1,))
+        # Без WAL коммит ждал бы, пока читатели не закончат, и падал
+        # бы с "database is locked"
+        writer.execute('BEGIN IMMEDIATE')
+        writer.execute('INSERT INTO item VALUES (2)')
+        writer.execute('COMMIT')
+        for reader in readers:
+            # Открытая транзакция читает свой снимок
+            self.assertEqual(
+                reader.execute('SELECT count(*) FROM item').fetchone(), (1,))
+            reader.execute('COMMIT')
+            self.assertEqual(
+                reader.execute('SELECT count(*) FROM item').fetchone(), (2,))
+
+
+class ProductionProfileTests(SimpleTestCase):
+
+    def load_settings(self, **env):
+        script = (
+            'import json, django\n'
+            'from django.conf import settings\n'
+            'django.setup()\n'
+            'print(json.dumps({\n'
+            '    "debug": settings.DEBUG,\n'
+            '    "apps": settings.INSTALLED_APPS,\n'
+            '    "middleware": settings.MIDDLEWARE,\n'
+            '    "database": settings.DATABASES["default"],\n'
+            '    "loaders": settings.TEMPLATES[0]["OPTIONS"].get("loaders"),\n'
+            '}))\n')
+        output = subprocess.check_output(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'yatube.settings',
+                 **env})
+        return json.loads(output)
+
+    def test_production(self):
+        loaded = self.load_settings(YATUBE_ENV='production',
+                                    YATUBE_SECRET_KEY='secret')
+        self.assertFalse(loaded['debug'])
+        self.assertNotIn('debug_toolbar', loaded['apps'])
+        self.assertFalse([name for name in loaded['middleware']
+                          if name.startswith('debug_toolbar')])
+        self.assertEqual(loaded['database']['ENGINE'],
+                         'yatube.backends.sqlite3')
+        self.assertGreater(loaded['database']['CONN_MAX_AGE'], 0)
+        self.assertEqual(loaded['loaders'][0][0],
+                         'django.template.loaders.cached.Loader')
+
+    def test_development(self):
+        loaded = self.load_settings(YATUBE_ENV='')
+        self.assertTrue(loaded['debug'])
+        self.assertIn('debug_toolbar', loaded['apps'])
+        self.assertEqual(loaded['database']['CONN_MAX_AGE'], 0)
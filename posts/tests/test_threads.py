@@ -0,0 +1,91 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import threads
+from posts.models import Comment, Post, User
+
+
+class CommentThreadTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='leo')
+        self.post = Post.objects.create(text='Пост', author=self.user)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def reply(self, parent=None, text='Ответ'):
+        comment = Comment.objects.create(post=self.post, author=self.user,
+                                         parent=parent, text=text)
+        comment.refresh_from_db()
+        return comment
+
+    def chain(self, length):
+        comments = [self.reply(text='Корень')]
+        for i in range(length - 1):
+            comments.append(self.reply(comments[-1], f'Уровень {i + 1}'))
+        return comments
+
+    def test_path_depth_and_reply_counts(self):
+        root = self.reply()
+        child = self.reply(root)
+        grandchild = self.reply(child)
+        self.reply(root)
+        self.assertEqual(grandchild.path, '.'.join(
+            threads.segment(c.pk) for c in (root, child, grandchild)))
+        self.assertEqual(grandchild.depth, 2)
+        root.refresh_from_db()
+        child.refresh_from_db()
+        self.assertEqual((root.reply_count, child.reply_count), (3, 1))
+        child.delete()
+        root.refresh_from_db()
+        self.assertEqual(root.reply_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+
+    def test_subtree_loads_in_one_query(self):
+        root, *rest = self.chain(threads.DISPLAY_DEPTH + 3)
+        other = self.reply(text='Другая ветка')
+        with self.assertNumQueries(1):
+            loaded = list(threads.threads(self.post.pk, [root]))
+        self.assertEqual([c.pk for c in loaded],
+                         [root.pk] + [c.pk for c in
+                                      rest[:threads.DISPLAY_DEPTH]])
+        self.assertNotIn(other.pk, [c.pk for c in loaded])
+        thread = threads.flatten([root], loaded)
+        self.assertTrue(thread[-1].collapsed)
+        self.assertFalse(any(c.collapsed for c in thread[:-1]))
+
+    def test_collapsed_branch_and_replies_fragment(self):
+        comments = self.chain(threads.DISPLAY_DEPTH + 3)
+        last_shown = comments[threads.DISPLAY_DEPTH]
+        response = self.client.get(
+            reverse('post', args=['leo', self.post.pk]))
+        self.assertContains(response, 'Ответов: 2')
+        self.assertNotContains(response, comments[-1].text)
+        response = self.client.get(reverse(
+            'comment_replies', args=['leo', self.post.pk, last_shown.pk]))
+        self.assertEqual([c.pk for c in response.context['thread']],
+                         [c.pk for c in comments[-2:]])
+
+    def test_reply_through_form(self):
+        root = self.reply()
+        self.client.post(reverse('add_comment', args=['leo', self.post.pk]),
+                         {'text': 'Ответ из формы', 'parent': root.pk})
+        reply = Comment.objects.get(text='Ответ из формы')
+        self.assertEqual(reply.parent_id, root.pk)
+        self.assertEqual(reply.depth, 1)
+        response = self.client.get(
+            reverse('post', args=['leo', self.post.pk]),
+            {'reply_to': root.pk})
+        self.assertContains(response, f'name="parent" value="{root.pk}"')
+
+    def test_too_deep_reply_becomes_sibling(self):
+        with mock.patch.object(threads, 'MAX_DEPTH', 2):
+            root, child, grandchild = self.chain(3)
+            extra = self.reply(grandchild)
+        self.assertEqual(extra.parent_id, child.pk)
+        self.assertEqual(extra.depth, 2)
@@ -0,0 +1,116 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import Post, ThumbnailJob, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_file(name='pic.png'):
+    buffer = BytesIO()
+    Image.new('RGB', (100, 100), (200, 0, 0)).save(buffer, 'png')
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ThumbnailTests(TransactionTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='leo', password='123')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_new_post_enqueues_and_worker_renders(self):
+        """Страница не делает превью сама: до обработчика видна заглушка,
+        после - готовое превью"""
+        self.client.post(reverse('new_post'),
+                         {'text': 'С картинкой', 'image': image_file()})
+        post = Post.objects.get()
+        self.assertEqual(ThumbnailJob.objects.filter(post=post).count(), 1)
+        thumbnails.attach([post])
+        self.assertIsNone(post.thumbnail)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'data:image/svg+xml')
+
+        call_command('thumbnail_worker', processes=0, once=True,
+                     stdout=StringIO())
+        self.assertFalse(ThumbnailJob.objects.exists())
+        thumbnails.attach([post])
+        self.assertIsNotNone(post.thumbnail)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, post.thumbnail.url)
+        self.assertNotContains(response, 'data:image/svg+xml')
+
+    def test_post_without_image_is_not_enqueued(self):
+        self.client.post(reverse('new_post'), {'text': 'Без картинки'})
+        self.assertFalse(ThumbnailJob.objects.exists())
+
+    def test_failed_job_is_retried_then_dropped(self):
+        post = Post.objects.create(text='Битая', author=self.user,
+                                   image='posts/missing.png')
+        thumbnails.enqueue(post)
+        for _ in range(thumbnails.MAX_ATTEMPTS):
+            self.assertTrue(ThumbnailJob.objects.exists())
+            job, = thumbnails.claim('worker', 10)
+            thumbnails.finish(job, ok=False)
+        self.assertFalse(ThumbnailJob.objects.exists())
+
+    def test_feed_resolves_thumbnails_in_one_batch(self):
+        """Превью всех постов страницы ищутся одним запросом к базе,
+        а повторно - только в кэше"""
+        posts = [Post.objects.create(text=f'Пост {i}', author=self.user,
+                                     image=image_file(f'pic{i}.png'))
+                 for i in range(5)]
+        for post in posts[:3]:
+            thumbnails.generate(post.pk)
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails.attach(posts)
+        self.assertEqual(sum(post.thumbnail is not None for post in posts), 3)
+        with self.assertNumQueries(0):
+            thumbnails.attach(posts)
+        response = self.client.get(reverse('index'))
+        for post in posts[:3]:
+            self.assertContains(response, post.thumbnail.url)
+
+    def test_card_has_srcset_of_all_widths(self):
+        post = Post.objects.create(text='Пост', author=self.user,
+                                   image=image_file())
+        thumbnails.generate(post.pk)
+        thumbnails.attach([post])
+        card = post.thumbnail
+        self.assertEqual((card.width, card.height), (960, 339))
+        widths = [int(item.rsplit(' ', 1)[1][:-1])
+                  for item in card.srcset.split(', ')]
+        self.assertEqual(widths, list(thumbnails.CARD_WIDTHS))
+        self.assertEqual(bool(card.webp_srcset), thumbnails.WEBP)
+        response = self.client.get(reverse('post', args=['leo', post.pk]))
+        self.assertContains(response, f'srcset="{card.srcset}"')
+        self.assertContains(response, 'width="960" height="339"')
+
+    def test_worker_can_enqueue_existing_posts(self):
+        post = Post.objects.create(text='Старый', author=self.user,
+                                   image=image_file())
+        Post.objects.create(text='Без картинки', author=self.user)
+        call_command('thumbnail_worker', processes=0, once=True,
+                     enqueue_all=True, stdout=StringIO())
+        thumbnails.attach([post])
+        self.assertIsNotNone(post.thumbnail)
+        response = self.client.get(reverse('post', args=['leo', post.pk]))
+        self.assertContains(response, post.thumbnail.url)
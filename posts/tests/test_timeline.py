@@ -0,0 +1,91 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import (Follow, Post, TimelineEntry, TimelineJob, User,
+                          UserStats)
+
+
+class TimelineTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed_ids(self, **params):
+        response = self.client.get(reverse('follow_index'), params)
+        return [post.pk for post in response.context['page']], \
+            response.context['page']
+
+    def test_fan_out_backfill_and_prune(self):
+        """Посты попадают в ленту при публикации и при подписке
+        и удаляются из неё при отписке"""
+        old = Post.objects.create(text='До подписки', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        new = Post.objects.create(text='После подписки', author=self.author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+        self.assertEqual(self.feed_ids()[0], [new.pk, old.pk])
+
+        Follow.objects.get(user=self.reader, author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.feed_ids()[0], [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_merged_on_read(self):
+        """Посты автора с большим числом подписчиков не раскладываются
+        по лентам, а подмешиваются при чтении в правильном порядке"""
+        fan = User.objects.create_user(username='fan')
+        star = User.objects.create_user(username='star')
+        Follow.objects.create(user=fan, author=star)
+        Follow.objects.create(user=self.reader, author=star)
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(12):
+            Post.objects.create(text=f'Пост {i}',
+                                author=star if i % 2 else self.author)
+        self.assertFalse(TimelineEntry.objects.filter(author=star))
+
+        expected = list(Post.objects.order_by('-pub_date', '-pk')
+                        .values_list('pk', flat=True))
+        first, page = self.feed_ids()
+        second, _ = self.feed_ids(cursor=page.next_cursor)
+        self.assertEqual(first + second, expected)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2, TIMELINE_DEMOTE_LIMIT=1)
+    def test_demoted_author_is_fanned_out_in_background(self):
+        """Отписка от знаменитости не раскладывает посты сама: это делает
+        timeline_worker, а до него посты подмешиваются при чтении"""
+        fans = [User.objects.create_user(username=f'fan{i}')
+                for i in range(2)]
+        for user in fans + [self.reader]:
+            Follow.objects.create(user=user, author=self.author)
+        post = Post.objects.create(text='Знаменитость', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(author=self.author))
+
+        # Порог пройден вниз, но не ниже TIMELINE_DEMOTE_LIMIT
+        Follow.objects.filter(user=fans[0]).delete()
+        self.assertFalse(TimelineJob.objects.exists())
+
+        # Постоянное число запросов: только постановка задания
+        with self.assertNumQueries(7):
+            Follow.objects.filter(user=fans[1]).delete()
+        self.assertFalse(TimelineEntry.objects.filter(author=self.author))
+        self.assertTrue(TimelineJob.objects.filter(author=self.author))
+        self.assertEqual(self.feed_ids()[0], [post.pk])
+
+        call_command('timeline_worker', once=True, stdout=StringIO())
+        self.assertFalse(TimelineJob.objects.exists())
+        self.assertFalse(UserStats.objects.get(user=self.author).celebrity)
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader,
+                                                     post=post))
+        self.assertEqual(self.feed_ids()[0], [post.pk])
+        # Новые посты снова раскладываются при публикации
+        new = Post.objects.create(text='Обычный', author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader,
+                                                     post=new))
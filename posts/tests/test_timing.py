@@ -0,0 +1,42 @@
+import re
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+
+class ServerTimingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='timer')
+        Post.objects.create(text='Пост', author=cls.user)
+
+    def phases(self, response):
+        header = response['Server-Timing']
+        return {name: float(duration) for name, duration in
+                re.findall(r'(\w+);dur=([\d.]+)', header)}
+
+    def test_header_has_all_phases(self):
+        response = self.client.get(reverse('index'))
+        phases = self.phases(response)
+        self.assertEqual(set(phases), {'db', 'tpl', 'cache', 'total'})
+        self.assertGreater(phases['tpl'], 0)
+        self.assertLessEqual(phases['tpl'], phases['total'])
+        self.assertRegex(response['Server-Timing'],
+                         r'db;dur=[\d.]+;desc="\d+ queries"')
+
+    def test_log_line(self):
+        with self.assertLogs('yatube.timing', 'INFO') as logs:
+            self.client.get(reverse('profile', args=[self.user.username]))
+        record = logs.records[0]
+        self.assertEqual(record.status, 200)
+        self.assertGreater(record.queries, 0)
+        self.assertGreater(record.cache_calls, 0)
+        self.assertIn('path=/timer/', record.getMessage())
+
+    @override_settings(SERVER_TIMING=False)
+    def test_header_can_be_disabled(self):
+        response = self.client.get(reverse('index'))
+        self.assertFalse(response.has_header('Server-Timing'))
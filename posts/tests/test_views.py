@@ -9,6 +9,7 @@ from PIL import Image
 
 from posts.models import Group, Post, User
 from posts.forms import PostForm
+from posts.versions import scope_version
 import logging
 from django.core.files.uploadedfile import SimpleUploadedFile
 
@@ -197,9 +198,9 @@ class TestProfileCreate(TestCase):
                                'text': 'test_cache'},
                               follow=True)
         post = Post.objects.get(author=user)
-        x = cache.get('index_page')
-        x = cache._cache.keys()
-        self.assertIn('index_page', f'{x}')
+        key = make_template_fragment_key(
+            'index_page', [scope_version('global'), None, f'{post.pk}|'])
+        self.assertIsNotNone(cache.get(key))
 
     def test_follow(self):
         """Проверка работы функции подписки"""
@@ -0,0 +1,121 @@
+"""Ветки ответов на комментарии с материализованным путём.
+
+Comment.path - id всех предков и самого комментария, каждый дополнен
+нулями до PATH_DIGITS цифр и отделён точкой: "0000000007.0000000042".
+Порядок по path - это обход дерева в глубину, а потомки комментария
+с путём P - ровно строки с path в полуинтервале [P + ".", P + "/")
+("/" идёт в ASCII сразу за "."). Поэтому ветка или поддерево до нужной
+глубины читаются одним запросом по индексу (post, path), а не
+рекурсивно по узлам. reply_count хранит размер поддерева, так что
+свёрнутая ветка показывает число ответов без запросов.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Concat
+
+from .models import Comment
+
+SEPARATOR = "."
+PATH_DIGITS = 10
+# Глубже ответы становятся соседями родителя; 20 уровней влезают в path
+MAX_DEPTH = 20
+# Сколько уровней ответов показывается сразу, глубже - ссылка на поддерево
+DISPLAY_DEPTH = 4
+# Отступ растёт только до этого уровня
+INDENT_LEVELS = 6
+
+
+def segment(pk):
+    return str(pk).zfill(PATH_DIGITS)
+
+
+def ancestor_ids(path):
+    return [int(pk) for pk in path.split(SEPARATOR)[:-1]]
+
+
+def descendants(path):
+    return Q(path__gt=path + SEPARATOR, path__lt=path + "/")
+
+
+def locate(parent_path, pk):
+    """(parent_id, path, depth) комментария с id pk, отвечающего на
+    комментарий с путём parent_path ("" - новая ветка). Ответ глубже
+    MAX_DEPTH становится соседом родителя."""
+    if not parent_path:
+        return None, segment(pk), 0
+    ids = parent_path.split(SEPARATOR)
+    if len(ids) > MAX_DEPTH:
+        ids.pop()
+    return int(ids[-1]), SEPARATOR.join(ids + [segment(pk)]), len(ids)
+
+
+def place(comment):
+    """Проставляет path и depth новому комментарию и увеличивает
+    reply_count всех его предков."""
+    parent_path = ""
+    if comment.parent_id is not None:
+        parent_path = Comment.objects.values_list("path", flat=True).get(
+            pk=comment.parent_id)
+    comment.parent_id, comment.path, comment.depth = locate(parent_path,
+                                                            comment.pk)
+    Comment.objects.filter(pk=comment.pk).update(
+        parent_id=comment.parent_id, path=comment.path, depth=comment.depth)
+    ancestors = ancestor_ids(comment.path)
+    if ancestors:
+        Comment.objects.filter(pk__in=ancestors).update(
+            reply_count=F("reply_count") + 1)
+
+
+def remove(comment):
+    """Уменьшает reply_count предков удалённого комментария. При удалении
+    ветки каскадом вызывается для каждого узла, поэтому вычитается 1."""
+    ancestors = ancestor_ids(comment.path)
+    if ancestors:
+        Comment.objects.filter(pk__in=ancestors, reply_count__gt=0).update(
+            reply_count=F("reply_count") - 1)
+
+
+def rebuild_reply_counts():
+    """Пересчитывает reply_count всех комментариев по path, например
+    после массового импорта. Возвращает число обновлённых строк."""
+    subtree = Comment.objects.filter(
+        post_id=OuterRef("post_id"),
+        path__gt=Concat(OuterRef("path"), Value(SEPARATOR)),
+        path__lt=Concat(OuterRef("path"), Value("/")),
+    ).order_by().values("post_id").annotate(total=Count("pk")).values("total")
+    return Comment.objects.update(
+        reply_count=Coalesce(Subquery(subtree), 0))
+
+
+def threads(post_id, roots, depth=DISPLAY_DEPTH):
+    """Один упорядоченный по path запрос: корни roots и их ответы
+    не глубже depth уровней от корня."""
+    condition = reduce(or_, (
+        Q(pk=root.pk) | descendants(root.path) & Q(
+            depth__lte=root.depth + depth)
+        for root in roots
+    ), Q(pk__in=[]))
+    return (Comment.objects.filter(condition, post_id=post_id)
+            .select_related("author").order_by("path"))
+
+
+def flatten(roots, comments, depth=DISPLAY_DEPTH):
+    """Комментарии в порядке показа: корни в порядке roots, под каждым
+    его ответы в порядке path. У каждого проставлены indent (отступ)
+    и collapsed - есть ли у него скрытые глубже depth ответы."""
+    subtrees = {root.path: [] for root in roots}
+    for comment in comments:
+        root_path = comment.path
+        while root_path not in subtrees:
+            root_path = root_path.rpartition(SEPARATOR)[0]
+        subtrees[root_path].append(comment)
+    result = []
+    for root in roots:
+        for comment in subtrees[root.path]:
+            comment.indent = min(comment.depth, INDENT_LEVELS)
+            comment.collapsed = (comment.depth - root.depth == depth
+                                 and comment.reply_count > 0)
+            result.append(comment)
+    return result
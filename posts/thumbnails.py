@@ -0,0 +1,188 @@
+"""Превью картинок постов, подготовленные заранее.
+
+new_post и post_edit ставят пост в очередь (ThumbnailJob), а превью всех
+геометрий из GEOMETRIES делает пул процессов команды thumbnail_worker.
+Шаблоны берут превью только из хранилища ключей sorl-thumbnail и, пока
+его нет, показывают заглушку, поэтому Pillow никогда не работает
+внутри запроса. Ленты ищут превью всех постов страницы разом (attach),
+одним get_many к кэшу и одним запросом к базе на промахи.
+
+Для карточки делается несколько ширин (CARD_WIDTHS) в JPEG и, если
+Pillow умеет, в WebP; шаблон отдаёт их через <picture> и srcset.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.utils import timezone
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend as SorlThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import \
+    KVStore as CachedDBKVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import versions
+from .models import Post, ThumbnailJob
+
+# Карточка поста: пропорции 960x339, ширины для srcset
+CARD_SIZE = (960, 339)
+CARD_WIDTHS = (480, 960, 1440)
+# WebP делается, только если Pillow собран с libwebp
+WEBP = features.check("webp")
+
+
+def card_geometry(width, format_="JPEG"):
+    height = round(width * CARD_SIZE[1] / CARD_SIZE[0])
+    return f"{width}x{height}", {"crop": "center", "upscale": True,
+                                 "format": format_}
+
+
+# Все превью, которые используют шаблоны: имя -> (геометрия, опции)
+GEOMETRIES = {f"card-{width}": card_geometry(width)
+              for width in CARD_WIDTHS}
+if WEBP:
+    GEOMETRIES.update({f"card-{width}-webp": card_geometry(width, "WEBP")
+                       for width in CARD_WIDTHS})
+# Превью для src; без него карточка показывает заглушку
+DEFAULT = f"card-{CARD_SIZE[0]}"
+
+# Серая заглушка того же размера, пока превью не готово
+PLACEHOLDER = (
+    "data:image/svg+xml;charset=utf-8,"
+    "%3Csvg xmlns='http://www.w3.org/2000/svg' width='960' height='339'%3E"
+    "%3Crect width='100%25' height='100%25' fill='%23e9ecef'/%3E%3C/svg%3E"
+)
+
+
+class Card(namedtuple("Card", "url srcset webp_srcset width height")):
+    """Готовые превью карточки: src, srcset для JPEG и для WebP."""
+
+
+MAX_ATTEMPTS = 3
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+class ThumbnailBackend(SorlThumbnailBackend):
+    """Бэкенд sorl-thumbnail с поиском готового превью без генерации."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """ImageFile превью с теми же именем и ключом, что построил бы
+        get_thumbnail()."""
+        source = ImageFile(file_)
+        if settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault("format", self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+class KVStore(CachedDBKVStore):
+    """Хранилище ключей sorl-thumbnail с пакетным чтением."""
+
+    def get_many(self, image_files):
+        """{image_file.key: ImageFile} для найденных файлов."""
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        values = self.cache.get_many(list(keys))
+        missing = [key for key in keys if key not in values]
+        if missing:
+            found = dict(KVStoreModel.objects.filter(key__in=missing)
+                         .values_list("key", "value"))
+            # Отсутствие тоже кэшируется, как в _get_raw()
+            stored = {key: found.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(stored, settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(stored)
+        return {keys[key]: deserialize_image_file(value)
+                for key, value in values.items()
+                if value and value != EMPTY_VALUE}
+
+
+def _srcset(ready, files, suffix=""):
+    return ", ".join(
+        f"{ready[files[name].key].url} {width}w"
+        for width in CARD_WIDTHS
+        for name in [f"card-{width}{suffix}"]
+        if name in files and files[name].key in ready)
+
+
+def attach(posts):
+    """Проставляет post.thumbnail (Card или None) всем постам за одно
+    обращение к хранилищу ключей."""
+    files = {
+        post.pk: {name: default.backend.thumbnail_file(post.image, geometry,
+                                                       **options)
+                  for name, (geometry, options) in GEOMETRIES.items()}
+        for post in posts if post.image
+    }
+    ready = default.kvstore.get_many(
+        image_file for variants in files.values()
+        for image_file in variants.values())
+    for post in posts:
+        variants = files.get(post.pk)
+        post.thumbnail = None
+        if variants and variants[DEFAULT].key in ready:
+            post.thumbnail = Card(ready[variants[DEFAULT].key].url,
+                                  _srcset(ready, variants),
+                                  _srcset(ready, variants, "-webp"),
+                                  *CARD_SIZE)
+
+
+def enqueue(post):
+    if post.image:
+        ThumbnailJob.objects.create(post=post)
+
+
+def enqueue_many(post_ids):
+    """Ставит в очередь посты по id одним bulk_create; возвращает их
+    число."""
+    jobs = [ThumbnailJob(post_id=pk) for pk in post_ids]
+    ThumbnailJob.objects.bulk_create(jobs, batch_size=1000)
+    return len(jobs)
+
+
+def enqueue_all():
+    """Ставит в очередь все посты с картинками; возвращает их число."""
+    return enqueue_many(Post.objects.exclude(
+        image="").exclude(image=None).values_list("pk", flat=True))
+
+
+def generate(post_id):
+    """Делает все превью поста; выполняется в процессе-обработчике."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    for geometry, options in GEOMETRIES.values():
+        default.backend.get_thumbnail(post.image, geometry, **options)
+    # Закэшированные ленты и карточка с заглушкой вместо картинки устарели
+    Post.objects.filter(pk=post.pk).update(updated=timezone.now())
+    versions.bump_post(post.author_id, post.group_id)
+
+
+def claim(token, batch_size):
+    """Забирает до batch_size заданий для обработчика token. Задания,
+    взятые упавшим обработчиком, через CLAIM_TIMEOUT выдаются снова."""
+    stale = timezone.now() - CLAIM_TIMEOUT
+    free = ThumbnailJob.objects.filter(claimed_by="") | \
+        ThumbnailJob.objects.filter(claimed_at__lt=stale)
+    ids = list(free.order_by("pk").values_list("pk", flat=True)[:batch_size])
+    free.filter(pk__in=ids).update(claimed_by=token,
+                                   claimed_at=timezone.now())
+    return list(ThumbnailJob.objects.filter(claimed_by=token))
+
+
+def finish(job, ok):
+    if ok or job.attempts + 1 >= MAX_ATTEMPTS:
+        job.delete()
+    else:
+        ThumbnailJob.objects.filter(pk=job.pk).update(
+            attempts=job.attempts + 1, claimed_by="", claimed_at=None)
@@ -0,0 +1,189 @@
+"""Лента подписок с раскладкой постов при записи (fan-out on write).
+
+Каждый пост при публикации копируется строкой TimelineEntry в ленты
+подписчиков автора, поэтому чтение ленты - один проход по индексу
+(user, pub_date, post). Посты авторов, у которых подписчиков больше
+settings.TIMELINE_FANOUT_LIMIT, не раскладываются: их подмешивают
+при чтении, чтобы один пост не порождал миллионы вставок.
+
+Такой автор отмечен UserStats.celebrity. Отметка снимается, только
+когда подписчиков становится не больше TIMELINE_DEMOTE_LIMIT: тогда
+отписка ставит TimelineJob, а manage.py timeline_worker раскладывает
+посты автора по лентам пачками и лишь после этого снимает отметку.
+До тех пор посты по-прежнему подмешиваются при чтении.
+"""
+import heapq
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Follow, Post, TimelineEntry, TimelineJob, UserStats
+from .pagination import NEXT, POSTS_PER_PAGE, build_page, read_cursor, window
+
+CLAIM_TIMEOUT = timedelta(minutes=30)
+
+
+def is_celebrity(author_id):
+    return UserStats.objects.filter(user_id=author_id,
+                                    celebrity=True).exists()
+
+
+def _insert(entries):
+    batch_size = settings.TIMELINE_BATCH_SIZE
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, batch_size))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Кладёт новый пост в ленты подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list("user_id", flat=True)
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post.pk,
+                      author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(follow):
+    """Добавляет в ленту нового подписчика уже вышедшие посты автора."""
+    if is_celebrity(follow.author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=follow.author_id).values_list("pk", "pub_date")
+    _insert(
+        TimelineEntry(user_id=follow.user_id, post_id=pk,
+                      author_id=follow.author_id, pub_date=pub_date)
+        for pk, pub_date in posts.iterator()
+    )
+
+
+def promote(author_id):
+    """Вызывается после подписки: автор с числом подписчиков больше
+    TIMELINE_FANOUT_LIMIT становится знаменитостью."""
+    UserStats.objects.filter(
+        user_id=author_id, celebrity=False,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).update(celebrity=True)
+
+
+def demote(author_id):
+    """Вызывается после отписки: ставит в очередь раскладку постов
+    знаменитости, у которой осталось не больше TIMELINE_DEMOTE_LIMIT
+    подписчиков. Сама раскладка - в demote_job, вне запроса."""
+    if UserStats.objects.filter(
+            user_id=author_id, celebrity=True,
+            followers_count__lte=settings.TIMELINE_DEMOTE_LIMIT).exists():
+        TimelineJob.objects.bulk_create([TimelineJob(author_id=author_id)],
+                                        ignore_conflicts=True)
+
+
+def _spread(author_id, user_ids, posts):
+    posts = list(posts.values_list("pk", "pub_date"))
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=pk,
+                      author_id=author_id, pub_date=pub_date)
+        for user_id in user_ids.iterator()
+        for pk, pub_date in posts
+    )
+
+
+def demote_job(author_id):
+    """Раскладывает посты автора по лентам подписчиков и снимает отметку
+    знаменитости; выполняется в timeline_worker. Пока раскладка идёт,
+    новые посты и подписки пропускаются fan_out и backfill, поэтому
+    после снятия отметки они докладываются вторым, коротким проходом."""
+    stats = UserStats.objects.filter(
+        user_id=author_id, celebrity=True,
+        followers_count__lte=settings.TIMELINE_DEMOTE_LIMIT)
+    if not stats.exists():
+        # Пока задание ждало, подписчиков снова стало много
+        return
+    started = timezone.now()
+    follows = Follow.objects.filter(author_id=author_id)
+    posts = Post.objects.filter(author_id=author_id)
+    followers = follows.values_list("user_id", flat=True)
+    _spread(author_id, followers, posts)
+    stats.update(celebrity=False)
+    _spread(author_id, followers, posts.filter(pub_date__gte=started))
+    _spread(author_id, follows.filter(subscribe_date__gte=started)
+            .values_list("user_id", flat=True), posts)
+
+
+def claim(token, batch_size):
+    """Забирает до batch_size заданий для обработчика token; задания
+    упавшего обработчика через CLAIM_TIMEOUT выдаются снова."""
+    stale = timezone.now() - CLAIM_TIMEOUT
+    free = TimelineJob.objects.filter(claimed_by="") | \
+        TimelineJob.objects.filter(claimed_at__lt=stale)
+    ids = list(free.order_by("pk").values_list("pk", flat=True)[:batch_size])
+    free.filter(pk__in=ids).update(claimed_by=token,
+                                   claimed_at=timezone.now())
+    return list(TimelineJob.objects.filter(pk__in=ids, claimed_by=token))
+
+
+def sync_celebrities():
+    """Отметки знаменитостей по текущим счётчикам, например после
+    массового импорта, который обходит сигналы."""
+    UserStats.objects.filter(
+        celebrity=False,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).update(celebrity=True)
+    UserStats.objects.filter(
+        celebrity=True,
+        followers_count__lte=settings.TIMELINE_DEMOTE_LIMIT,
+    ).update(celebrity=False)
+
+
+def prune(follow):
+    """Убирает посты автора из ленты отписавшегося."""
+    TimelineEntry.objects.filter(user_id=follow.user_id,
+                                 author_id=follow.author_id).delete()
+
+
+def rebuild(user_ids=None):
+    """Пересобирает ленты заново, например после массового импорта."""
+    entries = TimelineEntry.objects.all()
+    follows = Follow.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+        follows = follows.filter(user_id__in=user_ids)
+    entries.delete()
+    if user_ids is None:
+        sync_celebrities()
+    for follow in follows.iterator():
+        backfill(follow)
+
+
+def follow_feed(request, user, per_page=POSTS_PER_PAGE):
+    """Страница ленты подписок: (paginator, page) как у paginate()."""
+    token, cursor = read_cursor(request)
+    entries = TimelineEntry.objects.filter(user=user).select_related(
+        "post__author", "post__group")
+    rows = [entry.post for entry in
+            window(entries, cursor, per_page, tiebreak="post_id")]
+
+    celebrities = list(Follow.objects.filter(
+        user=user, author__stats__celebrity=True,
+    ).values_list("author_id", flat=True))
+    if celebrities:
+        merged = window(
+            Post.objects.for_feed().filter(author_id__in=celebrities),
+            cursor, per_page)
+        descending = cursor is None or cursor[0] == NEXT
+        seen = set()
+        rows = [
+            post for post in heapq.merge(
+                rows, merged, key=lambda post: (post.pub_date, post.pk),
+                reverse=descending)
+            if not (post.pk in seen or seen.add(post.pk))
+        ][:per_page + 1]
+    return build_page(rows, token, cursor, per_page)
@@ -15,6 +15,9 @@ urlpatterns = [
     path("follow/",
          views.follow_index,
          name="follow_index"),
+    path("search/",
+         views.search_posts,
+         name="search"),
     path("<str:username>/follow/",
          views.profile_follow,
          name="profile_follow"),
@@ -27,6 +30,12 @@ urlpatterns = [
     path('<str:username>/<int:post_id>/',
          views.post_view,
          name='post'),
+    path('<str:username>/<int:post_id>/comments/',
+         views.post_comments,
+         name='post_comments'),
+    path('<str:username>/<int:post_id>/comments/<int:comment_id>/',
+         views.comment_replies,
+         name='comment_replies'),
     path('<str:username>/<int:post_id>/edit/',
          views.post_edit,
          name='post_edit'),
@@ -0,0 +1,97 @@
+"""Счётчики поколений для ключей кэша лент.
+
+Каждой ленте соответствует область (scope): "global", "group:<id>",
+"author:<id>", а подпискам читателя - "follows:<id>"; "follows" меняется
+при любой подписке или отписке (счётчик в админке). Запись в ленту
+увеличивает счётчик её области, и фрагменты, закэшированные со старым
+значением в ключе, больше не используются. Поэтому фрагменты могут жить
+часами и всё равно устаревают сразу после записи.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from yatube import replica
+
+KEY_PREFIX = "feed_version"
+
+
+def _key(scope):
+    return f"{KEY_PREFIX}:{scope}"
+
+
+def _initial():
+    # После вытеснения счётчика из кэша новое значение не должно совпасть
+    # ни с одним из старых, поэтому отсчёт идёт от текущего времени.
+    return int(time.time() * 1000)
+
+
+def group_scope(group_id):
+    return f"group:{group_id}"
+
+
+def author_scope(author_id):
+    return f"author:{author_id}"
+
+
+def follows_scope(user_id):
+    return f"follows:{user_id}"
+
+
+def get_versions(*scopes):
+    """Текущие значения счётчиков, одним обращением к кэшу."""
+    keys = [_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: _initial() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    values = [found[key] for key in keys]
+    replica.written_at(*values)
+    return values
+
+
+def scope_version(*scopes):
+    """Строка для ключа фрагмента ленты, общего для всех читателей."""
+    return "-".join(str(version) for version in get_versions(*scopes))
+
+
+def viewer_versions(user, *scopes):
+    """Версии лент scopes и подписок читателя, от которых зависят
+    карточки постов."""
+    if user.is_authenticated:
+        scopes += (follows_scope(user.pk),)
+    return get_versions(*scopes)
+
+
+def feed_version(user, *scopes):
+    """То же с подписками читателя: для ETag и Last-Modified."""
+    return "-".join(str(version)
+                    for version in viewer_versions(user, *scopes))
+
+
+def bump(*scopes):
+    """Увеличивает счётчики после фиксации текущей транзакции: иначе
+    параллельный читатель увидел бы новую версию, прочитал ещё старые
+    строки и закэшировал их под новым ключом."""
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def _bump(scopes):
+    # Новое значение не меньше текущего времени в мс: по нему реплика
+    # базы понимает, что лента изменилась после её снимка
+    now = _initial()
+    keys = [_key(scope) for scope in scopes]
+    current = cache.get_many(keys)
+    for key in keys:
+        try:
+            cache.incr(key, max(1, now - current.get(key, now)))
+        except ValueError:
+            cache.set(key, now, None)
+
+
+def bump_post(author_id, *group_ids):
+    """Сбрасывает ленты, в которых показывается пост."""
+    bump("global", author_scope(author_id),
+         *(group_scope(group_id) for group_id in set(group_ids) if group_id))
@@ -1,32 +1,79 @@
-from django.contrib.auth.decorators import login_required
+from django.conf import settings
 from django.core.paginator import Paginator
+from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
+
+from yatube.replica import reads_from_replica
+
+from . import conditional, search, threads, thumbnails
+from .follow_graph import follow_graph
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .pagination import (COMMENTS_PER_PAGE, build_page, paginate,
+                         read_cursor, window)
+from .timeline import follow_feed
+from .versions import author_scope, group_scope, scope_version
+
+
+def mark_following(user, page):
+    """Отмечает в карточках постов всё, что зависит от читателя: подписан
+    ли он на автора и автор ли он сам. Эти отметки входят в ключ кэша
+    карточки (includes/post_item.html). Возвращает их сводку для ключа
+    фрагмента всей ленты: у анонимов и читателей без своих постов и
+    подписок на странице она одна и та же, и фрагмент у них общий."""
+    following = follow_graph.is_following_many(
+        user, [post.author for post in page])
+    own, followed = [], []
+    for post in page:
+        post.author_followed = following[post.author_id]
+        post.own = post.author_id == user.pk
+        if post.own:
+            own.append(str(post.pk))
+        if post.author_followed:
+            followed.append(str(post.pk))
+    return f"{','.join(own)}|{','.join(followed)}"
 
 
+@reads_from_replica
+@condition(etag_func=conditional.index_etag,
+           last_modified_func=conditional.index_last_modified)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    # Версия читается до выборки: ключ фрагмента не новее данных в нём
+    version = scope_version('global')
+    post_list = Post.objects.for_feed()
+    paginator, page = paginate(request, post_list)
+    viewer_key = mark_following(request.user, page)
+    thumbnails.attach(page)
     return render(
         request,
         'index.html',
-        {'page': page, 'paginator': paginator}
+        {'page': page,
+         'paginator': paginator,
+         'feed_version': version,
+         'viewer_key': viewer_key,
+         'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT}
     )
 
 
+@reads_from_replica
+@condition(etag_func=conditional.group_etag,
+           last_modified_func=conditional.group_last_modified)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()[:12]
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    version = scope_version(group_scope(group.pk))
+    post_list = group.posts.for_feed()
+    paginator, page = paginate(request, post_list)
+    viewer_key = mark_following(request.user, page)
+    thumbnails.attach(page)
     context = {"group": group,
                "posts": post_list,
                'page': page,
-               'paginator': paginator, }
+               'paginator': paginator,
+               'feed_version': version,
+               'viewer_key': viewer_key,
+               'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT}
     return render(
         request,
         'group.html',
@@ -34,6 +81,67 @@ def group_posts(request, slug):
     )
 
 
+def int_param(request, name):
+    try:
+        return int(request.GET[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    author_id = int_param(request, 'author')
+    group_id = int_param(request, 'group')
+    params = {'q': query}
+    if author_id is not None:
+        params['author'] = author_id
+    if group_id is not None:
+        params['group'] = group_id
+
+    facets = {'author': [], 'group': []}
+    if search.available():
+        ids, next_cursor = search.search(query, author_id, group_id,
+                                         request.GET.get('cursor'))
+        found = Post.objects.for_feed().in_bulk(ids)
+        paginator = Paginator([found[pk] for pk in ids if pk in found],
+                              search.RESULTS_PER_PAGE)
+        page = paginator.page(1)
+        page.next_cursor = next_cursor
+        counts = search.facets(query, author_id, group_id)
+        for facet, model in (('author', User), ('group', Group)):
+            objects = model.objects.in_bulk([pk for pk, _ in counts[facet]])
+            facets[facet] = [
+                (objects[pk], count, urlencode({**params, facet: pk}))
+                for pk, count in counts[facet] if pk in objects
+            ]
+    else:
+        post_list = Post.objects.for_feed().filter(text__icontains=query)
+        if author_id is not None:
+            post_list = post_list.filter(author_id=author_id)
+        if group_id is not None:
+            post_list = post_list.filter(group_id=group_id)
+        if not query:
+            post_list = post_list.none()
+        paginator, page = paginate(request, post_list)
+    mark_following(request.user, page)
+    thumbnails.attach(page)
+    next_query = None
+    if page.next_cursor:
+        next_query = urlencode({**params, 'cursor': page.next_cursor})
+    # Первая страница с теми же фильтрами
+    first = request.GET.copy()
+    first.pop('cursor', None)
+    context = {'query': query,
+               'page': page,
+               'paginator': paginator,
+               'facets': facets,
+               'next_query': next_query,
+               'first_query': first.urlencode(),
+               'reset_query': urlencode({'q': query}),
+               'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT}
+    return render(request, 'search.html', context)
+
+
 @login_required
 def new_post(request):
     if request.method != 'POST':
@@ -44,51 +152,108 @@ def new_post(request):
         new_post = form.save(commit=False)
         new_post.author = request.user
         new_post.save()
+        thumbnails.enqueue(new_post)
         return redirect('index')
     return render(request, 'new.html', {'form': form})
 
 
+@reads_from_replica
+@condition(etag_func=conditional.profile_etag,
+           last_modified_func=conditional.profile_last_modified)
 def profile(request, username):
     user = request.user
-    author = get_object_or_404(User, username=username)
-    posts_count = author.author_posts.all().count()
-    posts = author.author_posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    follow_list = Follow.objects.filter(user_id=user.pk)
-    ids = []
-    for x in follow_list:
-        ids.append(x.author_id)
-    if author.pk in ids:
-        following = True
-    else:
-        following = False
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    stats = UserStats.for_user(author)
+    version = scope_version(author_scope(author.pk))
+    posts = author.author_posts.for_feed()
+    paginator, page = paginate(request, posts)
+    viewer_key = mark_following(user, page)
+    thumbnails.attach(page)
+    following = follow_graph.is_following(user, author)
     context = {'following': following,
                'author': author,
-               'posts_count': posts_count,
+               'stats': stats,
+               'posts_count': stats.posts_count,
                'page': page,
-               'paginator': paginator}
+               'paginator': paginator,
+               'feed_version': version,
+               'viewer_key': viewer_key,
+               'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT}
     return render(request,
                   'profile.html',
                   context)
 
 
+@reads_from_replica
+@condition(etag_func=conditional.post_etag,
+           last_modified_func=conditional.post_last_modified)
 def post_view(request, username, post_id):
     form = CommentForm()
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__stats'), id=post_id)
+    thumbnails.attach([post])
+    mark_following(request.user, [post])
     author = post.author
-    posts_count = author.author_posts.all().count()
-    # Здесь переменные для комментов
-    comments = Comment.objects.filter(post_id=post_id)
+    stats = UserStats.for_user(author)
     context = {'author': author,
                'post': post,
                'form': form,
-               'comments': comments,
-               'posts_count': posts_count}
+               'reply_to': None,
+               'stats': stats,
+               'posts_count': stats.posts_count,
+               'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT}
+    reply_to = int_param(request, 'reply_to')
+    if reply_to is not None:
+        context['reply_to'] = post.comments.select_related(
+            'author').filter(pk=reply_to).first()
+    context.update(comment_threads(request, post))
     return render(request, 'post.html', context)
 
 
+def comment_threads(request, post):
+    """Страница корневых комментариев по курсору с ответами до
+    threads.DISPLAY_DEPTH уровней: два запроса при любой длине
+    обсуждения."""
+    token, cursor = read_cursor(request)
+    roots = window(Comment.objects.filter(post_id=post.pk, parent=None)
+                   .only('pk', 'created', 'path', 'depth'),
+                   cursor, COMMENTS_PER_PAGE, field='created')
+    paginator, page = build_page(roots, token, cursor, COMMENTS_PER_PAGE,
+                                 field='created')
+    comments = threads.threads(post.pk, page)
+    return {'comments': comments,
+            'thread': threads.flatten(page, comments),
+            'comments_cursor': page.next_cursor}
+
+
+@reads_from_replica
+def post_comments(request, username, post_id):
+    """Следующая страница комментариев HTML-фрагментом для post.html."""
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             author__username=username, id=post_id)
+    context = {'author': post.author, 'post': post}
+    context.update(comment_threads(request, post))
+    return render(request, 'includes/comment_list.html', context)
+
+
+@reads_from_replica
+def comment_replies(request, username, post_id, comment_id):
+    """Свёрнутое поддерево ответов HTML-фрагментом."""
+    root = get_object_or_404(Comment.objects.select_related('post__author'),
+                             pk=comment_id, post_id=post_id,
+                             post__author__username=username)
+    comments = threads.threads(post_id, [root])
+    # Сам комментарий уже показан на странице
+    thread = threads.flatten([root], comments)[1:]
+    context = {'author': root.post.author,
+               'post': root.post,
+               'comments': comments,
+               'thread': thread,
+               'comments_cursor': None}
+    return render(request, 'includes/comment_list.html', context)
+
+
 @login_required
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, author__username=username, id=post_id)
@@ -103,6 +268,8 @@ def post_edit(request, username, post_id):
     if request.method == 'POST':
         if form.is_valid():  # Проверяем форму
             form.save()
+            if 'image' in form.changed_data:
+                thumbnails.enqueue(post)
             return redirect("post", username=request.user.username,
                             post_id=post_id)
     context = {'is_edit': True,
@@ -134,22 +301,24 @@ def add_comment(request, post_id, username):
         comment = form.save(commit=False)
         comment.post_id = post_id
         comment.author_id = request.user.id
+        parent_id = request.POST.get('parent', '')
+        if parent_id.isdigit():
+            comment.parent = get_object_or_404(Comment, pk=parent_id,
+                                               post_id=post_id)
         form.save()
     return redirect("post", username=username,
                     post_id=post_id)
 
 
 @login_required
+@reads_from_replica
 def follow_index(request):
-    user = request.user
-    follow_list = user.follower.all()
-    following_posts = Post.objects.filter(author__following__user=request.user)
-    post_list = following_posts
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    paginator, page = follow_feed(request, request.user)
+    mark_following(request.user, page)
+    thumbnails.attach(page)
     context = {'page': page,
-               'paginator': paginator}
+               'paginator': paginator,
+               'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT}
     return render(request, "follow.html", context)
 
 
@@ -168,6 +337,5 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
-    x = Follow.objects.get(user_id=user.pk, author_id=author.pk)
-    x.delete()
+    Follow.objects.filter(user_id=user.pk, author_id=author.pk).delete()
     return redirect("follow_index")
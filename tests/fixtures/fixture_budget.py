@@ -0,0 +1,53 @@
+import tempfile
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from posts import budgets
+from posts.management.commands.benchmark import TIERS, url_list
+from posts.models import User
+
+
+@pytest.fixture(scope='module')
+def benchmark_dataset(django_db_setup, django_db_blocker):
+    """Набор данных benchmark (small) на время модуля; в конце откат."""
+    with django_db_blocker.unblock(), \
+            tempfile.TemporaryDirectory() as directory, \
+            override_settings(
+                MEDIA_ROOT=directory,
+                CACHES={'default': {
+                    'BACKEND': 'django.core.cache.backends.locmem.'
+                               'LocMemCache'}}):
+        with transaction.atomic():
+            call_command('generate_dataset', **TIERS['small'],
+                         stdout=StringIO())
+            yield dict(url_list())
+            transaction.set_rollback(True)
+
+
+@pytest.fixture
+def budget_client(benchmark_dataset):
+    client = Client()
+    client.force_login(
+        User.objects.order_by('-stats__following_count').first())
+    return client
+
+
+@pytest.fixture
+def query_budget(budget_client):
+    """Открывает страницу с пустым кэшем и падает, если запросы к базе
+    не уложились в budgets.BUDGETS."""
+    def check(name, path):
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            response = budget_client.get(path)
+        message = budgets.check(name, captured.captured_queries)
+        if message:
+            pytest.fail(f'{path}\n{message}', pytrace=False)
+        return response
+    return check
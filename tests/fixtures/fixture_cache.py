@@ -0,0 +1,10 @@
+import pytest
+
+from yatube.testing import isolated_cache
+
+
+@pytest.fixture(scope='session', autouse=True)
+def test_cache():
+    """Кэш тестов во временном файле, а не в cache.sqlite3 проекта."""
+    with isolated_cache() as location:
+        yield location
@@ -0,0 +1,46 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts import budgets
+
+
+@pytest.mark.parametrize('name', sorted(budgets.BUDGETS))
+def test_query_budget(name, benchmark_dataset, query_budget):
+    path = benchmark_dataset.get(name)
+    assert path is not None, f'Адрес {name} не найден в posts.urls'
+    response = query_budget(name, path)
+    assert response.status_code in (200, 302), \
+        f'{path} вернул {response.status_code}'
+
+
+def test_every_view_has_budget(benchmark_dataset):
+    missing = sorted(set(benchmark_dataset) - set(budgets.BUDGETS))
+    assert not missing, \
+        f'Нет бюджета запросов для {", ".join(missing)}: добавьте в ' \
+        f'posts/budgets.py'
+
+
+def test_duplicates_ignore_literals():
+    queries = [{'sql': 'SELECT * FROM "posts_post" WHERE "id" = 1',
+                'time': '0.001'},
+               {'sql': 'SELECT * FROM "posts_post" WHERE "id" = 2',
+                'time': '0.001'},
+               {'sql': "SELECT * FROM \"auth_user\" WHERE name = 'a'",
+                'time': '0.001'}]
+    assert budgets.duplicates(queries) == [
+        (2, 'SELECT * FROM "posts_post" WHERE "id" = ?')]
+    assert budgets.sql_time_ms(queries) == pytest.approx(3)
+
+
+@pytest.mark.parametrize('name', budgets.FEEDS)
+def test_feed_queries_use_indexes(name, benchmark_dataset, budget_client):
+    if connection.vendor != 'sqlite':
+        pytest.skip('EXPLAIN QUERY PLAN есть только в SQLite')
+    cache.clear()
+    with CaptureQueriesContext(connection) as captured:
+        budget_client.get(benchmark_dataset[name])
+    problems = budgets.unindexed(connection, captured.captured_queries)
+    assert not problems, '\n'.join(
+        f'{sql}\n    {"; ".join(plan)}' for sql, plan in problems)
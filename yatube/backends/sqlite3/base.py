@@ -0,0 +1,45 @@
+"""SQLite с настройками для многопроцессного веб-сервера.
+
+    DATABASES = {
+        'default': {
+            'ENGINE': 'yatube.backends.sqlite3',
+            'NAME': ...,
+            'OPTIONS': {'pragmas': {'cache_size': -64000}},
+        }
+    }
+
+При каждом подключении выполняются PRAGMA из PRAGMAS (значения из
+OPTIONS['pragmas'] их дополняют или заменяют). WAL позволяет читателям
+работать, пока идёт запись: читатель видит последнюю закоммиченную
+версию и не ждёт писателя. synchronous=NORMAL в режиме WAL не теряет
+целостность, а fsync делается только при checkpoint. busy_timeout - сколько
+миллисекунд писатель ждёт другого писателя, прежде чем получить
+"database is locked".
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    # Отрицательное значение - в КиБ: 64 МиБ страниц на соединение
+    "cache_size": -64000,
+    "mmap_size": 256 * 2 ** 20,
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # Не параметр sqlite3.connect
+        params.pop("pragmas", None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        pragmas = {**PRAGMAS,
+                   **self.settings_dict["OPTIONS"].get("pragmas", {})}
+        for name, value in pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
@@ -0,0 +1,257 @@
+"""Кэш в файле SQLite, общий для всех процессов WSGI на одной машине.
+
+В отличие от LocMemCache, фрагменты, версии лент и записи sorl-thumbnail
+видны всем воркерам сразу, а сброс в одном процессе действует во всех.
+Внешний сервер (Redis, memcached) не нужен. Файл открыт в режиме WAL:
+читатели не блокируют писателя. Размер ограничен числом записей
+(MAX_ENTRIES) и объёмом (MAX_SIZE, байт); при переполнении вытесняются
+давно не читанные записи (приближённый LRU).
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'yatube.cache.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 100000, 'MAX_SIZE': 256 * 2 ** 20},
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS cache_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_totals VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE cache_totals
+    SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE cache_totals
+    SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache
+BEGIN
+    UPDATE cache_totals
+    SET bytes = bytes - OLD.size + NEW.size WHERE id = 0;
+END;
+"""
+
+# Время последнего чтения обновляется не чаще, чем раз в столько секунд,
+# чтобы чтение почти никогда не превращалось в запись.
+TOUCH_INTERVAL = 30
+# Ограничение SQLite на число параметров в одном запросе.
+CHUNK_SIZE = 500
+
+
+class SQLiteCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._path = location
+        self._max_size = int(options.get("MAX_SIZE", 64 * 2 ** 20))
+        self._mmap_size = int(options.get("MMAP_SIZE", self._max_size))
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # Соединение своё у каждого потока и каждого процесса: после fork
+        # соединение родителя использовать нельзя.
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self._path, timeout=30,
+                                 isolation_level=None,
+                                 check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            # Иначе INSERT OR REPLACE не вызывает триггер удаления
+            # и счётчики cache_totals расходятся
+            db.execute("PRAGMA recursive_triggers=ON")
+            db.execute(f"PRAGMA mmap_size={self._mmap_size}")
+            db.executescript(SCHEMA)
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    @contextmanager
+    def _write(self):
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _alive(expires, now):
+        return expires is None or expires > now
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self._db.execute(
+            "SELECT value, expires, accessed FROM cache WHERE key = ?",
+            (key,)).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        if not self._alive(expires, now):
+            self._db.execute(
+                "DELETE FROM cache WHERE key = ? AND expires <= ?",
+                (key, now))
+            return default
+        if now - accessed > TOUCH_INTERVAL:
+            self._db.execute("UPDATE cache SET accessed = ? WHERE key = ?",
+                             (now, key))
+        return pickle.loads(value)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        now = time.time()
+        found, touch = {}, []
+        names = list(keys)
+        for start in range(0, len(names), CHUNK_SIZE):
+            chunk = names[start:start + CHUNK_SIZE]
+            rows = self._db.execute(
+                "SELECT key, value, expires, accessed FROM cache "
+                f"WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            for name, value, expires, accessed in rows:
+                if not self._alive(expires, now):
+                    continue
+                found[keys[name]] = pickle.loads(value)
+                if now - accessed > TOUCH_INTERVAL:
+                    touch.append((now, name))
+        if touch:
+            self._db.executemany(
+                "UPDATE cache SET accessed = ? WHERE key = ?", touch)
+        return found
+
+    def _rows(self, data, timeout):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        for key, value in data:
+            value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            yield key, value, expires, now, len(key) + len(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        rows = list(self._rows(
+            ((self._key(key, version), value) for key, value in data.items()),
+            timeout))
+        with self._write() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)", rows)
+            self._cull(db)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        row = next(self._rows([(self._key(key, version), value)], timeout))
+        with self._write() as db:
+            db.execute("DELETE FROM cache WHERE key = ? AND expires <= ?",
+                       (row[0], row[3]))
+            added = db.execute(
+                "INSERT OR IGNORE INTO cache VALUES (?, ?, ?, ?, ?)",
+                row).rowcount == 1
+            self._cull(db)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        return self._db.execute(
+            "UPDATE cache SET expires = ? WHERE key = ? "
+            "AND (expires IS NULL OR expires > ?)",
+            (self.get_backend_timeout(timeout), key, time.time())
+        ).rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно для всех процессов: чтение и запись под одной
+        блокировкой записи SQLite."""
+        key = self._key(key, version)
+        with self._write() as db:
+            row = db.execute(
+                "SELECT value, expires FROM cache WHERE key = ?",
+                (key,)).fetchone()
+            if row is None or not self._alive(row[1], time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            db.execute("UPDATE cache SET value = ?, size = ? WHERE key = ?",
+                       (data, len(key) + len(data), key))
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._db.execute("SELECT expires FROM cache WHERE key = ?",
+                               (key,)).fetchone()
+        return row is not None and self._alive(row[0], time.time())
+
+    def delete(self, key, version=None):
+        self._db.execute("DELETE FROM cache WHERE key = ?",
+                         (self._key(key, version),))
+
+    def delete_many(self, keys, version=None):
+        names = [(self._key(key, version),) for key in keys]
+        with self._write() as db:
+            db.executemany("DELETE FROM cache WHERE key = ?", names)
+
+    def clear(self):
+        self._db.execute("DELETE FROM cache")
+
+    def _cull(self, db):
+        """Вытесняет просроченные, затем давно не читанные записи, пока
+        кэш не уложится в MAX_ENTRIES и MAX_SIZE. Вызывается внутри
+        транзакции записи."""
+        entries, size = db.execute(
+            "SELECT entries, bytes FROM cache_totals").fetchone()
+        if entries <= self._max_entries and size <= self._max_size:
+            return
+        db.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        entries, size = db.execute(
+            "SELECT entries, bytes FROM cache_totals").fetchone()
+        if entries > self._max_entries:
+            if self._cull_frequency == 0:
+                db.execute("DELETE FROM cache")
+                return
+            db.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                "ORDER BY accessed LIMIT ?)",
+                (max(entries // self._cull_frequency,
+                     entries - self._max_entries),))
+        if size > self._max_size:
+            # Освобождаем с запасом, чтобы не вытеснять на каждой записи
+            excess = size - self._max_size * 0.9
+            victims = []
+            for key, item_size in db.execute(
+                    "SELECT key, size FROM cache ORDER BY accessed"):
+                if excess <= 0:
+                    break
+                victims.append((key,))
+                excess -= item_size
+            db.executemany("DELETE FROM cache WHERE key = ?", victims)
@@ -0,0 +1,141 @@
+"""Чтение лент с реплики базы, запись и чтение своих записей - с основной.
+
+    DATABASES = {'default': {...}, 'replica': {...}}
+    DATABASE_ROUTERS = ['yatube.replica.PrimaryReplicaRouter']
+    MIDDLEWARE = [..., 'yatube.replica.ReplicaMiddleware', ...]
+
+Views, помеченные @reads_from_replica, читают с алиаса "replica", всё
+остальное и любая запись идут в "default". Запрос, который что-то
+записал, ставит cookie: следующие REPLICA_MAX_LAG секунд браузер
+этого пользователя читает с основной базы и видит свой пост или
+комментарий. Дольше реплика отставать не может, поэтому после снятия
+привязки любая допустимая реплика уже содержит запись.
+
+Реплику обновляет команда refresh_replica: копия основной базы через
+sqlite3 backup API, читатели реплики в режиме WAL не блокируются. Время
+снимка хранится в кэше; отставание видно в заголовке X-Replica-Lag
+ответов, прочитанных с реплики, и в refresh_replica --status. Если
+отставание больше REPLICA_MAX_LAG или неизвестно, чтение идёт с
+основной базы. Так же читаются ленты, изменённые после снимка (см.
+written_at), чтобы их кэш не заполнялся устаревшими данными.
+"""
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+REPLICA = "replica"
+PIN_COOKIE = "primary_until"
+SNAPSHOT_KEY = "replica:snapshot"
+# Всегда читаются с основной базы: сессия, которой нет в реплике, была
+# бы сброшена вместе с cookie, и пользователь вышел бы из системы
+PRIMARY_APPS = {"sessions"}
+
+_local = threading.local()
+
+
+def enabled():
+    return REPLICA in settings.DATABASES
+
+
+def replica_lag():
+    """Секунды с момента снимка, с которого сделана реплика; None, если
+    реплика ещё не обновлялась."""
+    snapshot = cache.get(SNAPSHOT_KEY)
+    return None if snapshot is None else time.time() - snapshot
+
+
+def written_at(*versions):
+    """Счётчики posts.versions не меньше времени последней записи в ленту
+    (мс). Если лента менялась после снимка реплики, остаток запроса
+    читает основную базу: иначе фрагмент из устаревших данных попал бы
+    в кэш под новой версией."""
+    snapshot = getattr(_local, "snapshot", None)
+    if (getattr(_local, "replica", False) and snapshot is not None
+            and max(versions, default=0) >= snapshot * 1000):
+        _local.replica = False
+
+
+def reads_from_replica(view):
+    """Чтения внутри view идут с реплики (если она подходит)."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        _local.replica = getattr(request, "replica_allowed", False)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _local.replica = False
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if (getattr(_local, "replica", False)
+                and model._meta.app_label not in PRIMARY_APPS):
+            _local.used_replica = True
+            return REPLICA
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        _local.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика - копия основной базы
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == "default"
+
+
+class ReplicaMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.wrote = _local.used_replica = False
+        _local.snapshot = None
+        if enabled() and not self.pinned(request):
+            snapshot = cache.get(SNAPSHOT_KEY)
+            if (snapshot is not None and time.time() - snapshot
+                    <= settings.REPLICA_MAX_LAG):
+                _local.snapshot = snapshot
+                request.replica_allowed = True
+        response = self.get_response(request)
+        if _local.used_replica:
+            lag = time.time() - _local.snapshot
+            response["X-Replica-Lag"] = f"{lag:.3f}"
+        if _local.wrote:
+            response.set_cookie(
+                PIN_COOKIE, str(time.time() + settings.REPLICA_MAX_LAG),
+                max_age=settings.REPLICA_MAX_LAG, httponly=True)
+        return response
+
+    @staticmethod
+    def pinned(request):
+        try:
+            return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+def refresh(source, target):
+    """Копирует файл основной базы source в реплику target. Источник
+    читается одним снимком (запись в основную базу в WAL не ждёт),
+    запись в реплику - одна транзакция: её читатели видят либо старую,
+    либо новую копию целиком."""
+    started = time.time()
+    source_db = sqlite3.connect(source)
+    target_db = sqlite3.connect(target, timeout=30)
+    try:
+        source_db.backup(target_db)
+    finally:
+        source_db.close()
+        target_db.close()
+    cache.set(SNAPSHOT_KEY, started, None)
+    return time.time() - started
@@ -19,20 +19,31 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
 
+# Профиль выбирается переменной окружения: YATUBE_ENV=production на
+# боевом сервере, иначе настройки разработки
+PRODUCTION = os.environ.get("YATUBE_ENV") == "production"
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = "gm939qnowpdp*5q*ti(0fvr%zs35@$b8r6+641t3ty)6h65z9#"
+if PRODUCTION:
+    SECRET_KEY = os.environ["YATUBE_SECRET_KEY"]
+else:
+    SECRET_KEY = "gm939qnowpdp*5q*ti(0fvr%zs35@$b8r6+641t3ty)6h65z9#"
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = not PRODUCTION
 
 
-ALLOWED_HOSTS = [
-    "*",
-    "localhost",
-    "127.0.0.1",
-    "[::1]",
-    "testserver",
-]
+if PRODUCTION:
+    ALLOWED_HOSTS = os.environ.get(
+        "YATUBE_ALLOWED_HOSTS", "localhost").split(",")
+else:
+    ALLOWED_HOSTS = [
+        "*",
+        "localhost",
+        "127.0.0.1",
+        "[::1]",
+        "testserver",
+    ]
 
 
 # Application definition
@@ -40,7 +51,6 @@ ALLOWED_HOSTS = [
 INSTALLED_APPS = [
     "users",
     "posts",
-    "debug_toolbar",
     'django.contrib.sites',
     'django.contrib.flatpages',
     "django.contrib.admin",
@@ -54,6 +64,8 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    "yatube.timing.ServerTimingMiddleware",
+    "yatube.replica.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -61,9 +73,32 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
 ]
 
+if DEBUG:
+    INSTALLED_APPS += ["debug_toolbar"]
+    MIDDLEWARE += ["debug_toolbar.middleware.DebugToolbarMiddleware"]
+
+# Заголовок Server-Timing с разбивкой времени по db/tpl/cache,
+# см. yatube/timing.py
+SERVER_TIMING = True
+
+# Строка лога с теми же замерами на каждый запрос; при DEBUG не выводится
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'yatube.timing': {
+            'handlers': ['console'],
+            'level': 'WARNING' if DEBUG else 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
@@ -89,19 +124,50 @@ TEMPLATES = [
     },
 ]
 
+if PRODUCTION:
+    # Скомпилированные шаблоны хранятся в памяти процесса; при
+    # изменении файлов шаблонов сервер нужно перезапустить
+    TEMPLATES[0]["APP_DIRS"] = False
+    TEMPLATES[0]["OPTIONS"]["loaders"] = [
+        ("django.template.loaders.cached.Loader", [
+            "django.template.loaders.filesystem.Loader",
+            "django.template.loaders.app_directories.Loader",
+        ]),
+    ]
+
 WSGI_APPLICATION = "yatube.wsgi.application"
 
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# SQLite в режиме WAL и с PRAGMA из yatube/backends/sqlite3/base.py
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "yatube.backends.sqlite3",
         "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        # Соединение живёт между запросами: PRAGMA и кэш страниц SQLite
+        # не пропадают после каждого запроса
+        "CONN_MAX_AGE": 600 if PRODUCTION else 0,
     }
 }
 
+# Реплика для чтения лент, см. yatube/replica.py. Локально: задать
+# YATUBE_REPLICA_DB=replica.sqlite3 и запустить manage.py refresh_replica
+if os.environ.get("YATUBE_REPLICA_DB"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.environ["YATUBE_REPLICA_DB"],
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["yatube.replica.PrimaryReplicaRouter"]
+# При большем отставании реплики чтение идёт с основной базы. Столько же
+# секунд после записи пользователь читает с основной базы: любая
+# допустимая реплика к этому времени содержит его запись
+REPLICA_MAX_LAG = 30
+REPLICA_REFRESH_INTERVAL = 1
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -122,12 +188,25 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Общий для всех процессов кэш в SQLite-файле, см. yatube/cache.py
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'yatube.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 2 ** 20,
+        },
     }
 }
 
+# Тесты работают с отдельным файлом кэша, см. yatube/testing.py
+TEST_RUNNER = "yatube.testing.TestRunner"
+
+# Фрагменты лент сбрасываются счётчиками поколений (posts.versions),
+# поэтому могут жить долго
+FEED_CACHE_TIMEOUT = 60 * 60 * 12
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
@@ -155,6 +234,21 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Приём картинок постов, см. posts/images.py
+IMAGE_MAX_UPLOAD_SIZE = 10 * 2 ** 20
+# Предел пикселей после уменьшенного декодирования JPEG
+IMAGE_MAX_PIXELS = 40 * 10 ** 6
+# Предел для форматов, которые декодируются целиком (PNG, GIF, ...):
+# 12 Мпикс - около 48 МБ в RGBA
+IMAGE_MAX_FULL_PIXELS = 12 * 10 ** 6
+IMAGE_MAX_SIDE = 1920
+# 'WEBP' экономнее, если Pillow собран с libwebp
+IMAGE_FORMAT = 'JPEG'
+
+# Превью картинок готовит команда thumbnail_worker, см. posts/thumbnails.py
+THUMBNAIL_BACKEND = 'posts.thumbnails.ThumbnailBackend'
+THUMBNAIL_KVSTORE = 'posts.thumbnails.KVStore'
+
 LOGIN_URL = "/auth/login/"
 LOGIN_REDIRECT_URL = "index"
 LOGOUT_REDIRECT_URL = "index"
@@ -163,4 +257,14 @@ LOGOUT_REDIRECT_URL = "index"
 #  подключаем движок filebased.EmailBackend
 EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 # указываем директорию, в которую будут складываться файлы писем
-EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
\ No newline at end of file
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
+
+
+# Лента подписок: авторам с числом подписчиков больше лимита посты
+# не раскладываются по лентам при публикации, а подмешиваются при чтении
+TIMELINE_FANOUT_LIMIT = 10000
+# Обратно в раскладку автор возвращается, только когда подписчиков
+# не больше этого числа: отписки и подписки у порога не гоняют его туда
+# и обратно. Посты раскладывает manage.py timeline_worker
+TIMELINE_DEMOTE_LIMIT = 9000
+TIMELINE_BATCH_SIZE = 1000
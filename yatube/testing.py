@@ -0,0 +1,38 @@
+"""Окружение тестов с отдельным файлом кэша.
+
+    TEST_RUNNER = "yatube.testing.TestRunner"
+
+Кэш из settings.CACHES - общий файл SQLite разработчика или сервера,
+а тесты вызывают cache.clear() и стёрли бы его. На время тестов CACHES
+указывает на файл во временном каталоге; для pytest то же делает
+фикстура из tests/fixtures/fixture_cache.py.
+"""
+import os
+import tempfile
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+@contextmanager
+def isolated_cache():
+    with tempfile.TemporaryDirectory() as directory:
+        location = os.path.join(directory, "cache.sqlite3")
+        with override_settings(CACHES={
+                "default": {**settings.CACHES["default"],
+                            "LOCATION": location}}):
+            yield location
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.stack = ExitStack()
+        self.stack.enter_context(isolated_cache())
+
+    def teardown_test_environment(self, **kwargs):
+        self.stack.close()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,158 @@
+"""Время запроса по фазам: заголовок Server-Timing и строка лога.
+
+    MIDDLEWARE = ["yatube.timing.ServerTimingMiddleware", ...]
+
+Фазы:
+
+    db     запросы ко всем базам (execute_wrapper), число запросов;
+    tpl    рендеринг шаблонов: время внешних Template.render, include
+           внутри уже учтён;
+    cache  вызовы кэшей из CACHES, число обращений и промахов;
+    total  весь запрос от этой middleware и ниже.
+
+Фазы пересекаются: запрос к базе из ленивого QuerySet в шаблоне попадает
+и в db, и в tpl. Замер - только perf_counter и сложение, поэтому
+middleware можно держать включённой на боевом сервере. Заголовок
+отключается настройкой SERVER_TIMING = False (лог пишется всегда,
+логгер yatube.timing, уровень INFO).
+"""
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template import base
+
+logger = logging.getLogger(__name__)
+
+# Методы кэша, которые учитываются; get* отдельно считают промахи
+CACHE_METHODS = ("get", "get_many", "set", "set_many", "add", "delete",
+                 "delete_many", "incr", "decr", "touch", "has_key")
+
+_local = threading.local()
+
+
+class Timings:
+    def __init__(self):
+        self.db = self.tpl = self.cache = 0.0
+        self.queries = self.cache_calls = self.cache_misses = 0
+        # Глубина вложенных Template.render
+        self.depth = 0
+
+    def header(self, total):
+        return ", ".join([
+            f'db;dur={self.db:.1f};desc="{self.queries} queries"',
+            f"tpl;dur={self.tpl:.1f}",
+            f'cache;dur={self.cache:.1f};desc="{self.cache_calls} calls, '
+            f'{self.cache_misses} misses"',
+            f"total;dur={total:.1f}",
+        ])
+
+
+def current():
+    return getattr(_local, "timings", None)
+
+
+def _render(render):
+    @wraps(render)
+    def timed(self, context):
+        timings = current()
+        if timings is None:
+            return render(self, context)
+        timings.depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            timings.depth -= 1
+            if not timings.depth:
+                timings.tpl += (time.perf_counter() - started) * 1000
+    timed.timed = True
+    return timed
+
+
+def _misses(name, result, args, kwargs):
+    if name == "get":
+        default = args[1] if len(args) > 1 else kwargs.get("default")
+        return int(result is default)
+    if name == "get_many":
+        return len(args[0]) - len(result)
+    return 0
+
+
+def _cache_method(name, method):
+    @wraps(method)
+    def timed(*args, **kwargs):
+        timings = current()
+        if timings is None:
+            return method(*args, **kwargs)
+        started = time.perf_counter()
+        result = method(*args, **kwargs)
+        timings.cache += (time.perf_counter() - started) * 1000
+        timings.cache_calls += 1
+        timings.cache_misses += _misses(name, result, args, kwargs)
+        return result
+    return timed
+
+
+def instrument_cache(cache):
+    """Оборачивает методы экземпляра кэша; экземпляры caches[alias] свои
+    у каждого потока и живут всё время работы процесса."""
+    if getattr(cache, "_timed", False):
+        return
+    for name in CACHE_METHODS:
+        setattr(cache, name, _cache_method(name, getattr(cache, name)))
+    cache._timed = True
+
+
+def query_timer(execute, sql, params, many, context):
+    timings = current()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += (time.perf_counter() - started) * 1000
+        timings.queries += 1
+
+
+class ServerTimingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not getattr(base.Template.render, "timed", False):
+            base.Template.render = _render(base.Template.render)
+
+    def __call__(self, request):
+        for alias in settings.CACHES:
+            instrument_cache(caches[alias])
+        timings = _local.timings = Timings()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(query_timer))
+                response = self.get_response(request)
+        finally:
+            _local.timings = None
+        total = (time.perf_counter() - started) * 1000
+        if getattr(settings, "SERVER_TIMING", True):
+            response["Server-Timing"] = timings.header(total)
+        logger.info(
+            "timing method=%s path=%s status=%s total_ms=%.1f db_ms=%.1f "
+            "queries=%d tpl_ms=%.1f cache_ms=%.1f cache_calls=%d "
+            "cache_misses=%d",
+            request.method, request.path, response.status_code, total,
+            timings.db, timings.queries, timings.tpl, timings.cache,
+            timings.cache_calls, timings.cache_misses,
+            extra={"path": request.path, "status": response.status_code,
+                   "total_ms": total, "db_ms": timings.db,
+                   "queries": timings.queries, "tpl_ms": timings.tpl,
+                   "cache_ms": timings.cache,
+                   "cache_calls": timings.cache_calls,
+                   "cache_misses": timings.cache_misses})
+        return response
@@ -31,6 +31,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     # flatpages
     path('about/', include('django.contrib.flatpages.urls')),
+    # JSON API для мобильных клиентов
+    path('api/v1/', include('posts.api_urls')),
     # импорт из приложения posts
     path('', include('posts.urls')),
 ]